@@ -0,0 +1,200 @@
+"""
+Benchmarks of the montecarlo package: times every Dice, Game and Analyzer operation, and records its peak memory,
+over a sweep of numbers of rolls, dice and faces, with numeric and string faces.
+
+Results are written to a CSV file with one row per operation and setting, so that runs of two versions of the package
+can be compared, e.g. with pandas:
+
+    python MonteCarlo_benchmarks.py --output before.csv
+    python MonteCarlo_benchmarks.py --output after.csv
+    python MonteCarlo_benchmarks.py --compare before.csv after.csv
+"""
+
+import argparse
+import gc
+import inspect
+import platform
+import string
+import time
+import tracemalloc
+
+import pandas as pd
+import numpy as np
+
+from montecarlo import Dice, Game, Analyzer
+
+
+#Operations benchmarked on a played game, in the order they are run
+ANALYZER_OPERATIONS = ['jackpot', 'face_count', 'combo_count', 'permutation_count']
+
+
+def make_faces(face_num, kind):
+    """
+    PURPOSE: Builds the faces of a die.
+
+    INPUTS:
+        face_num (int): The number of faces.
+        kind (str): 'numeric' for the integers 1 to face_num, or 'string' for distinct letters (or pairs of letters).
+
+    OUTPUTS:
+        np.ndarray: The faces.
+    """
+
+    if kind == 'numeric':
+        return np.arange(1, face_num + 1)
+    letters = list(string.ascii_uppercase)
+    labels = letters + [a + b for a in letters for b in letters]
+    return np.array(labels[:face_num])
+
+
+def supported(method, **kwargs):
+    """
+    PURPOSE: Binds the keyword arguments that a method accepts, so the same suite runs against older versions of the
+    package (e.g. without the rng argument of play).
+
+    INPUTS:
+        method (callable): The method to call.
+        **kwargs: The keyword arguments to pass when the method accepts them.
+
+    OUTPUTS:
+        dict: The accepted keyword arguments.
+    """
+
+    parameters = inspect.signature(method).parameters
+    return {name: value for name, value in kwargs.items() if name in parameters}
+
+
+def measure(operation, repeat = 1, setup = None):
+    """
+    PURPOSE: Runs an operation and measures its wall time and the peak memory it allocates.
+
+    INPUTS:
+        operation (callable): The operation to run, without arguments.
+        repeat (int): The number of runs; the fastest time is kept. Defaults to 1.
+        setup (callable): Called before every run, untimed, e.g. to drop results cached by the previous run. Defaults to None.
+
+    OUTPUTS:
+        Tuple: (seconds, peak_bytes). Peak memory is traced by tracemalloc, which also sees NumPy allocations.
+    """
+
+    best, peak = np.inf, 0
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        best = min(best, elapsed)
+    return best, peak
+
+
+def run_suite(rolls_list, dice_list, faces_list, kinds, repeat = 1, max_cells = 10**8, verbose = True):
+    """
+    PURPOSE: Benchmarks every operation over the sweep of settings.
+
+    INPUTS:
+        rolls_list (List): Numbers of rolls.
+        dice_list (List): Numbers of dice per game.
+        faces_list (List): Numbers of faces per die.
+        kinds (List): Kinds of faces, 'numeric' and/or 'string'.
+        repeat (int): Runs per operation, the fastest is kept. Defaults to 1.
+        max_cells (int): Settings with more than max_cells rolls x dice are skipped. Defaults to 10**8.
+        verbose (bool): Prints each result as it is measured. Defaults to True.
+
+    OUTPUTS:
+        pd.DataFrame: One row per operation and setting, with 'seconds', 'peak_mb' and 'rolls_per_second' columns.
+    """
+
+    records = []
+
+    def record(operation, kind, faces, dice, rolls, seconds, peak):
+        records.append({'operation': operation, 'kind': kind, 'faces': faces, 'dice': dice, 'rolls': rolls,
+                        'seconds': seconds, 'peak_mb': peak / 2**20, 'rolls_per_second': rolls / seconds if seconds else np.inf})
+        if verbose:
+            print(f"{operation:>20} {kind:>8} faces={faces:<4} dice={dice:<3} rolls={rolls:<10} "
+                  f"{seconds:10.4f} s {peak / 2**20:10.1f} MB")
+
+    for kind in kinds:
+        for face_num in faces_list:
+            faces = make_faces(face_num, kind)
+
+            for rolls in rolls_list:
+                die = Dice(faces)
+                options = supported(die.roll_the_die, as_array = True, rng = 0)
+                seconds, peak = measure(lambda: die.roll_the_die(rolls, **options), repeat)
+                record('roll_the_die', kind, face_num, 1, rolls, seconds, peak)
+
+                for dice_num in dice_list:
+                    if rolls * dice_num > max_cells:
+                        continue
+                    game = Game([Dice(faces) for i in range(dice_num)])
+                    options = supported(game.play, rng = 0)
+                    seconds, peak = measure(lambda: game.play(rolls, **options), repeat)
+                    record('play', kind, face_num, dice_num, rolls, seconds, peak)
+
+                    #Games cache their views and analyzers memoize their statistics, so every run starts from scratch
+                    #(versions of the package without cached views have no release_views)
+                    release_views = getattr(game, 'release_views', None)
+                    seconds, peak = measure(lambda: game.show_results('narrow'), repeat, release_views)
+                    record('show_results_narrow', kind, face_num, dice_num, rolls, seconds, peak)
+
+                    for name in ANALYZER_OPERATIONS:
+                        seconds, peak = measure(lambda: getattr(Analyzer(game), name)(), repeat)
+                        record(name, kind, face_num, dice_num, rolls, seconds, peak)
+
+    results = pd.DataFrame.from_records(records)
+    results['python'] = platform.python_version()
+    results['numpy'] = np.__version__
+    results['pandas'] = pd.__version__
+    return results
+
+
+def compare(before, after):
+    """
+    PURPOSE: Compares two result files written by this script.
+
+    INPUTS:
+        before (str): The CSV file of the reference run.
+        after (str): The CSV file of the new run.
+
+    OUTPUTS:
+        pd.DataFrame: The time and peak memory of both runs per operation and setting, with the speedup
+        (before / after time) and the memory ratio (after / before).
+    """
+
+    keys = ['operation', 'kind', 'faces', 'dice', 'rolls']
+    merged = pd.read_csv(before).merge(pd.read_csv(after), on = keys, suffixes = ('_before', '_after'))
+    merged['speedup'] = merged['seconds_before'] / merged['seconds_after']
+    merged['memory_ratio'] = merged['peak_mb_after'] / merged['peak_mb_before']
+    return merged[keys + ['seconds_before', 'seconds_after', 'speedup', 'peak_mb_before', 'peak_mb_after', 'memory_ratio']]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--rolls', type = int, nargs = '+', default = [10**4, 10**5, 10**6],
+                        help = 'numbers of rolls (default: 10**4 10**5 10**6; add 10**7 10**8 for a full sweep)')
+    parser.add_argument('--dice', type = int, nargs = '+', default = [1, 2, 5], help = 'numbers of dice (default: 1 2 5)')
+    parser.add_argument('--faces', type = int, nargs = '+', default = [2, 6, 26], help = 'numbers of faces (default: 2 6 26)')
+    parser.add_argument('--kinds', nargs = '+', default = ['numeric', 'string'], choices = ['numeric', 'string'])
+    parser.add_argument('--repeat', type = int, default = 1, help = 'runs per operation, the fastest is kept')
+    parser.add_argument('--max-cells', type = int, default = 10**8, help = 'skip games with more rolls x dice')
+    parser.add_argument('--output', default = 'benchmarks.csv', help = 'CSV file to write the results to')
+    parser.add_argument('--compare', nargs = 2, metavar = ('BEFORE', 'AFTER'), help = 'compare two result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(compare(*args.compare).to_string(index = False))
+        return
+
+    results = run_suite(args.rolls, args.dice, args.faces, args.kinds, args.repeat, args.max_cells)
+    results.to_csv(args.output, index = False)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,13 @@
+import asyncio
+import importlib.util
+import os
+import pickle
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
 
-from montecarlo import Dice, Game, Analyzer
+from montecarlo import Dice, Game, Analyzer, StreamAnalyzer, Vocabulary, ExactAnalyzer, Profile, Sweep, SimulationService
 
 class DieGameTestSuite(unittest.TestCase):
     
@@ -45,6 +50,8 @@ class DieGameTestSuite(unittest.TestCase):
         d3 = Dice(faces)
         game1 = Game([d1,d2,d3])
         self.assertTrue((game1.list_of_dice[0].faces == faces).all())
+        with self.assertRaises(ValueError):
+            Game([])
            
     def test_6_play(self):  
         # create a game object and play. Test if the results are correctly stored
@@ -139,7 +146,437 @@ class DieGameTestSuite(unittest.TestCase):
         self.assertTrue(type(perm_count) == pd.DataFrame)
         self.assertTrue(isinstance(perm_count.index, pd.MultiIndex))
 
+
+    def test_13_roll_the_die_array(self):
+        # roll a die into a NumPy array with a seed. Test the length, that zero-weight faces never come up and that the seed reproduces the rolls
+        die9 = Dice(np.array(['a','b','c']))
+        die9.change_weight('b', 0)
+        rolls = 1000
+        results = die9.roll_the_die(rolls, as_array = True, rng = 7)
+        self.assertEqual(type(results), np.ndarray)
+        self.assertEqual(len(results), rolls)
+        self.assertFalse((results == 'b').any())
+        self.assertTrue((results == die9.roll_the_die(rolls, as_array = True, rng = 7)).all())
+        die9b = Dice(np.arange(11))
+        die9b.change_weight(10, 0)
+        self.assertEqual(die9b._indices_from_uniforms(np.array([1 - 2**-53]), method = 'cdf')[0], 9)
+
+    def test_14_play_grouped_dice(self):
+        # play a game mixing fair and loaded dice. Test the shape, the labels and that a loaded die only rolls its heavy face
+        faces = np.array(['H','T'])
+        fair1 = Dice(faces)
+        fair2 = Dice(faces)
+        loaded = Dice(faces)
+        loaded.change_weight('T', 0)
+        game9 = Game([fair1, loaded, fair2])
+        rolls = 50
+        game9.play(rolls, rng = 1)
+        results = game9.show_results()
+        self.assertEqual(results.shape, (rolls, 3))
+        self.assertEqual(list(results.columns), [1,2,3])
+        self.assertTrue((results[2] == 'H').all())
+
+    def test_15_alias_sampling(self):
+        # create a 26 face die that rolls with the alias table. Test that the rolled frequencies follow the weights and that a weight change rebuilds the table
+        letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+        die10 = Dice(letters)
+        die10.change_weight('A', 25.0)
+        rolls = 100000
+        results = die10.roll_the_die(rolls, as_array = True, rng = 3)
+        self.assertAlmostEqual((results == 'A').mean(), 0.5, delta = 0.01)
+        die10.change_weight('A', 0)
+        results = die10.roll_the_die(rolls, as_array = True, rng = 3)
+        self.assertFalse((results == 'A').any())
+
+    def test_16_integer_coded_results(self):
+        # play a game with string faces. Test that results are stored as uint8 codes and decoded to labels by show_results
+        faces = np.array(['c','a','b'])
+        game10 = Game([Dice(faces), Dice(faces)])
+        game10.play(20, rng = 5)
+        self.assertEqual(game10._play_results.to_numpy().dtype, np.uint8)
+        self.assertTrue(game10.show_results().isin(faces).all().all())
+        face_counts = Analyzer(game10).face_count()
+        self.assertEqual(list(face_counts.columns), ['a','b','c'])
+        self.assertTrue((face_counts.sum(axis = 1) == 2).all())
+
+    def test_17_jackpot_rolls_and_faces(self):
+        # force two jackpots into a game. Test that their roll numbers and faces are reported
+        faces = np.array([1,2,3,4,5,6])
+        game11 = Game([Dice(faces), Dice(faces), Dice(faces)])
+        game11.play(5, rng = 2)
+        game11._play_results.iloc[:] = np.array([[0,1,2],[3,3,3],[0,1,2],[5,5,5],[0,1,2]], dtype = np.uint8)          #codes of faces 1..6
+        analyzer6 = Analyzer(game11)
+        self.assertEqual(analyzer6.jackpot(), 2)
+        self.assertEqual(list(analyzer6.jackpot_rolls()), [2,4])
+        self.assertEqual(analyzer6.jackpot_faces().loc[4], 1)
+        self.assertEqual(analyzer6.jackpot_faces().loc[6], 1)
+        self.assertEqual(analyzer6.jackpot_faces().sum(), 2)
+
+    def test_18_combo_and_permutation_values(self):
+        # force known rolls into a game. Test that combinations ignore order, permutations do not, and counts are correct
+        faces = np.array(['x','y','z'])
+        game12 = Game([Dice(faces), Dice(faces)])
+        game12.play(4, rng = 0)
+        game12._play_results.iloc[:] = np.array([[0,1],[1,0],[1,0],[2,2]], dtype = np.uint8)
+        analyzer7 = Analyzer(game12)
+        combos = analyzer7.combo_count()
+        perms = analyzer7.permutation_count()
+        self.assertEqual(combos.loc[('x','y'), 'Count'], 3)
+        self.assertEqual(len(combos), 2)
+        self.assertEqual(perms.loc[('y','x'), 'Count'], 2)
+        self.assertEqual(len(perms), 3)
         
+    def test_19_permutation_count_many_dice(self):
+        # play a game with too many dice to pack a roll into one integer key. Test that every roll is still counted
+        faces = np.array([1,2,3,4,5,6])
+        game13 = Game([Dice(faces) for i in range(30)])
+        rolls = 50
+        game13.play(rolls, rng = 4)
+        perms = Analyzer(game13).permutation_count()
+        self.assertEqual(perms['Count'].sum(), rolls)
+        self.assertEqual(perms.index.nlevels, 30)
+
+    def test_20_stream_analyzer(self):
+        # analyze a game in chunks. Test that the running statistics match an Analyzer over the same rolls played at once
+        faces = np.array([1,2,3])
+        game14 = Game([Dice(faces), Dice(faces), Dice(faces)])
+        rolls = 1000
+        stream = StreamAnalyzer(game14).run(rolls, chunk_size = 300, rng = 8)
+        game14.play(rolls, rng = 8)                  #the same seed gives the same rolls whatever the chunk size
+        analyzer8 = Analyzer(game14)
+        self.assertEqual(stream.rolls, rolls)
+        self.assertEqual(stream.jackpot(), analyzer8.jackpot())
+        self.assertTrue(stream.combo_count().equals(analyzer8.combo_count()))
+        self.assertTrue(stream.permutation_count().equals(analyzer8.permutation_count()))
+        self.assertEqual(stream.face_histogram().sum(), rolls * 3)
+
+    def test_21_parallel_play_reproducible(self):
+        # play the same seeded game with one and with two worker processes. Test that the results are identical
+        faces = np.array([1,2,3,4,5,6])
+        loaded = Dice(faces)
+        loaded.change_weight(6, 5.0)
+        game15 = Game([Dice(faces), loaded, Dice(faces)])
+        rolls = 150000                              #more than two blocks of rolls
+        game15.play(rolls, rng = 11, workers = 1)
+        serial = game15._play_results.to_numpy().copy()
+        game15.play(rolls, rng = 11, workers = 2)
+        self.assertTrue((game15._play_results.to_numpy() == serial).all())
+        stream = StreamAnalyzer(game15).run(rolls, rng = 11, workers = 2)
+        self.assertEqual(stream.jackpot(), Analyzer(game15).jackpot())
+
+    def test_22_shared_memory_results(self):
+        # play into shared memory and pickle the game. Test that the copy attaches to the same buffer instead of copying the rolls
+        faces = np.array([1,2,3,4,5,6])
+        game16 = Game([Dice(faces), Dice(faces)])
+        game16.play(100000, rng = 3, store = 'shared')
+        pickled = pickle.dumps(game16)
+        self.assertTrue(len(pickled) < 100000)
+        attached = pickle.loads(pickled)
+        game16._play_results.iloc[0] = [5,5]                    #a write by the owner is seen by the attached copy
+        self.assertEqual(list(attached._play_results.iloc[0]), [5,5])
+        self.assertEqual(Analyzer(attached).jackpot(), Analyzer(game16).jackpot())
+        attached.release_results()
+        game16.release_results()
+        with self.assertRaises(ValueError):
+            game16.play(10, store = 'Shared')
+        game16.play(10, rng = 3, store = 'shared')
+        with self.assertRaises(ValueError):
+            game16.play(10, append = True)                      #appending would silently move the rolls out of shared memory
+        game16.release_results()
+        
+    def test_23_memory_mapped_results(self):
+        # play into a memory-mapped file. Test that a handle reopens the same results in another game
+        faces = np.array(['a','b'])
+        game17 = Game([Dice(faces), Dice(faces)])
+        with tempfile.TemporaryDirectory() as folder:
+            game17.play(500, rng = 3, store = os.path.join(folder, 'rolls.npy'))
+            game18 = Game([Dice(faces), Dice(faces)])
+            game18.attach_results(game17.results_handle())
+            self.assertTrue(game18.show_results().equals(game17.show_results()))
+            game18.release_results()
+            game17.release_results()
+
+    def test_24_save_and_load(self):
+        # save a played game and load it back. Test that the rolls, the weights and the seed survive, and that the rolls are memory-mapped
+        faces = np.array(['x','y','z'])
+        loaded = Dice(faces)
+        loaded.change_weight('z', 4.0)
+        game19 = Game([Dice(faces), loaded])
+        game19.play(300, rng = 12)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'play.npz')
+            game19.save(path)
+            game20 = Game.load(path)
+            codes = game20._play_results.to_numpy()
+            while codes is not None and not isinstance(codes, np.memmap):
+                codes = codes.base
+            self.assertTrue(isinstance(codes, np.memmap))
+            self.assertTrue(game20.show_results().equals(game19.show_results()))
+            self.assertEqual(game20.list_of_dice[1]._my_die.loc['z','weights'], 4.0)
+            self.assertTrue(Analyzer(game20).permutation_count().equals(Analyzer(game19).permutation_count()))
+            game20.play(300, rng = game20._seed)                #replaying from the saved seed reproduces the play
+            self.assertTrue(game20.show_results().equals(game19.show_results()))
+            game19.save(os.path.join(folder, 'run'))            #the suffix is added on save and on load alike
+            self.assertTrue(Game.load(os.path.join(folder, 'run'), mmap = False).show_results().equals(game19.show_results()))
+
+    def test_25_vocabulary_match(self):
+        # roll forced letter sequences and match the permutations against a vocabulary. Test that only words are returned, with their counts
+        letters = np.array(['A','O','T','X'])
+        game21 = Game([Dice(letters), Dice(letters)])
+        game21.play(4, rng = 1)
+        game21._play_results.iloc[:] = np.array([[0,2],[0,2],[3,3],[1,0]], dtype = np.uint8)          #AT, AT, XX, OA
+        vocabulary = Vocabulary(['AT', 'TO', 'OX'])
+        words = vocabulary.match(Analyzer(game21).permutation_count())
+        self.assertEqual(list(words.index), ['AT'])
+        self.assertEqual(words.loc['AT', 'Count'], 2)
+        
+    def test_26_vocabulary_from_file(self):
+        # load the scrabble word list twice. Test that the file is read once and that lookups work
+        vocabulary = Vocabulary.from_file('scrabble_words.txt')
+        self.assertTrue(Vocabulary.from_file('scrabble_words.txt') is vocabulary)
+        self.assertTrue('AAH' in vocabulary)
+        self.assertFalse('QXZ' in vocabulary)
+
+    def test_27_exact_analyzer(self):
+        # compute the exact statistics of two fair dice. Test the jackpot probability and the combination and permutation probabilities
+        faces = np.array([1,2,3,4,5,6])
+        game22 = Game([Dice(faces), Dice(faces)])
+        exact = ExactAnalyzer(game22)
+        self.assertAlmostEqual(exact.jackpot(), 1/6)
+        self.assertAlmostEqual(exact.face_count().loc[0, 1], 25/36)
+        combos = exact.combo_count()
+        self.assertEqual(len(combos), 21)
+        self.assertAlmostEqual(combos.loc[(1,2), 'Probability'], 2/36)
+        perms = exact.permutation_count()
+        self.assertEqual(len(perms), 36)
+        self.assertAlmostEqual(perms['Probability'].sum(), 1.0)
+        
+    def test_28_exact_analyzer_fallback(self):
+        # create a game too large to enumerate. Test that combinations are estimated by simulation and the game results are untouched
+        faces = np.array(['H','T'])
+        game23 = Game([Dice(faces) for i in range(3)])
+        exact = ExactAnalyzer(game23, max_outcomes = 4, fallback_rolls = 20000)
+        self.assertFalse(exact.is_exact)
+        combos = exact.combo_count(rng = 5)
+        self.assertAlmostEqual(combos.loc[('H','H','H'), 'Probability'], 1/8, delta = 0.02)
+        self.assertFalse(hasattr(game23, '_play_results'))
+
+    def test_29_run_until_tolerance(self):
+        # run an adaptive simulation of a coin game. Test that it stops once the intervals are narrow enough, well before max_rolls
+        faces = np.array(['H','T'])
+        game24 = Game([Dice(faces), Dice(faces)])
+        stream = StreamAnalyzer(game24, track_combos = False).run_until(0.01, batch_size = 1000, max_rolls = 10**6, rng = 6)
+        self.assertTrue(stream.converged)
+        self.assertTrue(stream.rolls < 10**6)
+        self.assertEqual(stream.rolls % 1000, 0)
+        rate, half_width = stream.jackpot_interval()
+        self.assertTrue(half_width <= 0.01)
+        self.assertAlmostEqual(rate, 0.5, delta = 0.03)
+        self.assertTrue((stream.face_intervals()['half_width'] <= 0.01).all())
+        rare = [Dice(np.array([1,2,3])), Dice(np.array([1,2,3]))]
+        for die in rare:
+            die.set_weights([1, 1, 1e-7])
+        stream = StreamAnalyzer(Game(rare), track_combos = False).run_until(0.1, stats = ['faces'], batch_size = 1000, 
+                                                                             max_rolls = 5000, rng = 1, relative = True)
+        self.assertFalse(stream.converged)                      #a face never seen is not known to within 10%
+        self.assertTrue(stream.face_intervals()['half_width'][3] > 0)
+
+    def test_30_importance_sampling(self):
+        # create a game where a jackpot of sixes is very rare. Test that an importance-sampled play estimates its probability while a plain play misses it
+        faces = np.array([1,2,3,4,5,6])
+        game25 = Game([Dice(faces) for i in range(5)])
+        for die in game25.list_of_dice:
+            die.change_weight(6, 0.2)
+        exact = ExactAnalyzer(game25).jackpot_faces()[6]
+        game25.play(20000, rng = 1)
+        self.assertEqual(Analyzer(game25).jackpot_faces()[6], 0)
+        game25.play(20000, rng = 1, sampling = 'importance', proposal = [1,1,1,1,1,5])
+        self.assertAlmostEqual(Analyzer(game25).jackpot_faces()[6] / 20000, exact, delta = exact * 0.2)
+        self.assertEqual(game25._roll_weights.shape, (20000,))
+        with self.assertRaises(ValueError):
+            game25.play(10, sampling = 'importance', proposal = [1,1,1,1,1,0])
+
+    def test_31_stratified_and_antithetic(self):
+        # play a die game with stratified and antithetic rolls. Test that face frequencies are close to the weights and results do not depend on workers
+        faces = np.array([1,2,3,4,5,6])
+        game26 = Game([Dice(faces), Dice(faces)])
+        game26.play(60000, rng = 2, sampling = 'stratified')
+        frequencies = np.bincount(game26._play_results.to_numpy().ravel()) / 120000
+        self.assertTrue(np.allclose(frequencies, 1/6, atol = 1e-4))
+        for sampling in ('stratified', 'antithetic'):
+            game26.play(70000, rng = 3, sampling = sampling)
+            serial = game26._play_results.to_numpy().copy()
+            game26.play(70000, rng = 3, sampling = sampling, workers = 2)
+            self.assertTrue((serial == game26._play_results.to_numpy()).all())
+        self.assertIsNone(game26._roll_weights)
+
+    def test_32_profile(self):
+        # play and analyze a game while profiling. Test that phases, rolls, result bytes and cache use are recorded only while the profile is active
+        faces = np.array([1,2,3,4,5,6])
+        game27 = Game([Dice(faces), Dice(faces)])
+        events = []
+        with Profile(callback = lambda kind, name, value: events.append(name)) as profile:
+            game27.play(1000, rng = 7)
+            Analyzer(game27).combo_count()
+            game27.show_results('narrow')
+        report = profile.report()
+        for phase in ['Game.play', 'Game.play.sample', 'Analyzer.combo_count', 'Game.show_results.narrow']:
+            self.assertEqual(report.loc[phase, 'calls'], 1)
+        self.assertEqual(profile.counters['rolls'], 1000)
+        self.assertEqual(profile.counters['result_bytes'], 2000)
+        self.assertEqual(profile.counters['cache_misses'], 3)         #probabilities of both dice, cdf of their group
+        self.assertIn('Game.play', events)
+        game27.play(10)
+        self.assertEqual(profile.counters['rolls'], 1000)
+        outer, inner = Profile(), Profile()
+        outer.__enter__()
+        inner.__enter__()
+        with self.assertRaises(RuntimeError):                   #exiting out of order would leave the wrong profile active
+            outer.__exit__(None, None, None)
+        inner.__exit__(None, None, None)
+        outer.__exit__(None, None, None)
+        game27.play(10)
+        self.assertEqual(outer.counters, {})
+        self.assertEqual(inner.counters, {})
+
+    def test_33_memoized_and_appended(self):
+        # analyze a game, then append rolls to it. Test that statistics are memoized until the game changes and match a fresh analyzer after appending
+        faces = np.array([1,2,3])
+        game28 = Game([Dice(faces), Dice(faces)])
+        game28.play(500, rng = 8)
+        analyzer = Analyzer(game28)
+        combos = analyzer.combo_count()
+        self.assertEqual(analyzer._cache['combo_count'][0], game28._version)
+        self.assertTrue(combos.equals(analyzer.combo_count()))
+        analyzer.face_count()
+        analyzer.jackpot()
+        game28.play(300, rng = 9, append = True)
+        self.assertEqual(game28._play_results.shape, (800, 2))
+        fresh = Analyzer(game28)
+        self.assertEqual(analyzer.jackpot(), fresh.jackpot())
+        self.assertTrue(analyzer.combo_count().equals(fresh.combo_count()))
+        self.assertTrue(analyzer.face_count().equals(fresh.face_count()))
+        self.assertTrue(analyzer.jackpot_rolls().equals(fresh.jackpot_rolls()))
+        game28.play(100)
+        self.assertEqual(analyzer.face_count().shape[0], 100)
+
+    def test_34_show_results_views(self):
+        # show the results of a play several times. Test that views share the decoded labels, match the stacked narrow format and never change the results
+        faces = np.array(['A','B','C'])
+        game29 = Game([Dice(faces), Dice(faces)])
+        game29.play(20, rng = 10)
+        wide = game29.show_results()
+        narrow = game29.show_results('narrow')
+        self.assertTrue(np.shares_memory(narrow['outcomes'].to_numpy(), game29.show_results('narrow')['outcomes'].to_numpy()))
+        self.assertTrue(narrow.equals(wide.stack().to_frame('outcomes')))
+        first = wide.iloc[0, 0]
+        try:
+            wide.iloc[0, 0] = 'Z'
+        except ValueError:
+            pass
+        self.assertEqual(game29.show_results().iloc[0, 0], first)
+        copied = game29.show_results('narrow', copy = True)
+        self.assertFalse(np.shares_memory(copied['outcomes'].to_numpy(), narrow['outcomes'].to_numpy()))
+        game29.release_views()
+        rebuilt = game29.show_results('narrow')
+        self.assertFalse(np.shares_memory(rebuilt['outcomes'].to_numpy(), narrow['outcomes'].to_numpy()))
+        self.assertTrue(rebuilt.equals(narrow))
+
+    def test_35_sparse_face_count(self):
+        # play a game with a thousand faces. Test that the sparse face counts match the dense ones and that the histogram adds them up across rolls
+        faces = np.arange(1000)
+        game30 = Game([Dice(faces) for i in range(3)])
+        game30.play(200, rng = 11)
+        analyzer = Analyzer(game30)
+        dense = analyzer.face_count()
+        self.assertEqual(dense.shape, (200, 1000))
+        self.assertTrue((dense.sum(axis = 1) == 3).all())
+        self.assertTrue((dense.sum() == analyzer.face_histogram()).all())
+
+    def test_36_sweep(self):
+        # sweep a fair and an unfair coin rolled twice. Test the tidy table, the estimates and that common random numbers make the paired difference more precise
+        weights = pd.DataFrame([[1,1],[1,3]], index = ['fair','unfair'], columns = ['H','T'])
+        sweep = Sweep(np.array(['H','T']), weights, dice_num = 2)
+        table = sweep.run(20000, rng = 12, baseline = 'fair')
+        self.assertEqual(list(table.columns), ['scenario','statistic','face','estimate','half_width','difference','difference_half_width'])
+        self.assertEqual(len(table), 6)
+        unfair = table[(table['scenario'] == 'unfair') & (table['face'] == 'T')].iloc[0]
+        self.assertAlmostEqual(unfair['estimate'], 0.75, delta = 0.02)
+        self.assertTrue(unfair['difference_half_width'] < unfair['half_width'])
+        self.assertTrue(table.equals(sweep.run(20000, rng = 12, baseline = 'fair', workers = 2)))
+        with self.assertRaises(ValueError):
+            Sweep(np.array(['H','T']), [[1,1,1]])
+        dice = Sweep(np.arange(1000), np.ones((2, 1000)), dice_num = 2).run(1000, rng = 1, baseline = 0)
+        self.assertEqual(dice['face'].iloc[1], 0)
+        self.assertTrue(isinstance(dice['face'].iloc[1], (int, np.integer)))
+        self.assertTrue((dice['difference'].iloc[1002:] == 0).all())
+
+    def test_37_simulation_service(self):
+        # play and stream games through the asyncio service. Test that plays match Game.play, dice are shared, progress is reported and plays can be cancelled
+        faces = np.array([1,2,3,4,5,6])
+        reference = Game([Dice(faces), Dice(faces)])
+        reference.play(200000, rng = 13)
+        
+        async def requests():
+            service = SimulationService(chunk_size = 65536)
+            game31 = service.game(faces, dice_num = 2)
+            self.assertIs(service.game(faces, dice_num = 2).list_of_dice[0], game31.list_of_dice[0])
+            progress = []
+            played = await service.play(game31, 200000, rng = 13, progress = lambda done, rolls: progress.append(done))
+            self.assertTrue((played._play_results.to_numpy() == reference._play_results.to_numpy()).all())
+            self.assertEqual(progress[-1], 200000)
+            self.assertEqual(len(progress), 4)
+            self.assertEqual(await service.analyze(played, 'jackpot'), Analyzer(reference).jackpot())
+            combos = await service.analyze(played, 'combo_count')
+            self.assertIn('combinations', service._memos[played])                   #memoized across requests
+            self.assertTrue((await service.analyze(played, 'combo_count')).equals(combos))
+            seen = [analyzer.rolls async for analyzer in service.stream(game31, 100000, rng = 14, track_combos = False)]
+            self.assertEqual(seen, [65536, 100000])
+            task = asyncio.ensure_future(service.play(game31, 10**8, rng = 15))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        asyncio.run(requests())
+        
+    def test_38_set_weights(self):
+        # change many weights at once. Test that the weights, the data frame and the rolls follow, and that bad faces or weights raise errors
+        faces = np.array(['a','b','c','d'])
+        die14 = Dice(faces)
+        die14.set_weights([1, 2, 3, 4])
+        self.assertEqual(die14._my_die.loc['d','weights'], 4.0)
+        die14.set_weights([0, 0], ['c', 'd'])
+        self.assertEqual(list(die14.weights), [1.0, 2.0, 0.0, 0.0])
+        self.assertTrue(set(die14.roll_the_die(1000)) <= {'a', 'b'})
+        with self.assertRaises(IndexError):
+            die14.set_weights([1], ['z'])
+        with self.assertRaises(ValueError):
+            die14.set_weights([1, 2, 3])
+        with self.assertRaises(TypeError):
+            die14.set_weights(['x', 'y', 'z', 'w'])
+        game32 = Game([Dice(faces) for i in range(50)] + [die14])
+        self.assertEqual(len(game32.list_of_dice), 51)
+        with self.assertRaises(ValueError):
+            Game([die14, Dice(np.array(['a','b','c','e']))])
+        shared = np.array([1,2,3])
+        Dice(shared)
+        shared[0] = 2                                           #the faces are checked again once they change
+        with self.assertRaises(ValueError):
+            Dice(shared)
+        with self.assertRaises(ValueError):
+            Dice(np.array([np.nan, np.nan]))
+
+    @unittest.skipUnless(importlib.util.find_spec('scipy'), "scipy not installed")
+    def test_39_sparse_face_count_frame(self):
+        # count the faces of a thousand-face game as a sparse data frame. Test that it stores only the faces rolled and matches the dense counts
+        faces = np.arange(1000)
+        game33 = Game([Dice(faces) for i in range(3)])
+        game33.play(200, rng = 11)
+        analyzer = Analyzer(game33)
+        sparse = analyzer.face_count(sparse = True)
+        self.assertTrue(sparse.sparse.density <= 3 / 1000)
+        self.assertTrue(np.array_equal(sparse.sparse.to_dense().to_numpy(), analyzer.face_count().to_numpy()))
         
         
 if __name__ == '__main__':
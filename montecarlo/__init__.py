@@ -1,2 +1,6 @@
-from .montecarlo import Dice, Game, Analyzer
-
+from .montecarlo import Dice, Game, Analyzer, StreamAnalyzer
+from .vocabulary import Vocabulary
+from .exact import ExactAnalyzer
+from .profiling import Profile
+from .sweep import Sweep
+from .service import SimulationService
@@ -0,0 +1,258 @@
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+
+from .montecarlo import Game, StreamAnalyzer, _count_rows, _counts_frame, _decode_keys
+
+
+#Each entry holds up to max_outcomes floats (8 MB at the default 10**6), so only a few sets of weights are kept
+@lru_cache(maxsize = 8)
+def _permutation_probabilities(probabilities, dice_num, face_num):
+    """
+    PURPOSE: Computes the probability of every permutation of faces, memoized per set of weights.
+
+    INPUTS:
+        probabilities (bytes): The dice x faces matrix of face probabilities (float64, in face code order), as bytes so it can be hashed.
+        dice_num (int): The number of dice.
+        face_num (int): The number of faces.
+
+    OUTPUTS:
+        np.ndarray: The probability of every permutation, indexed by its row key (see _row_keys).
+    """
+
+    matrix = np.frombuffer(probabilities).reshape(dice_num, face_num)
+
+    # Each die multiplies every permutation so far by each of its faces, in the order of the row keys
+    outcomes = matrix[0]
+    for die in matrix[1:]:
+        outcomes = np.outer(outcomes, die).ravel()
+    outcomes.flags.writeable = False
+    return outcomes
+
+
+@lru_cache(maxsize = 128)
+def _face_distributions(probabilities, dice_num, face_num):
+    """
+    PURPOSE: Computes, for every face, the probability that it shows up on exactly k dice of a roll, memoized per set of weights.
+
+    INPUTS:
+        probabilities (bytes): The dice x faces matrix of face probabilities, as bytes so it can be hashed.
+        dice_num (int): The number of dice.
+        face_num (int): The number of faces.
+
+    OUTPUTS:
+        np.ndarray: A (dice + 1) x faces array; entry [k, f] is the probability that face f shows up k times.
+    """
+
+    matrix = np.frombuffer(probabilities).reshape(dice_num, face_num)
+
+    # Convolve the dice one at a time: each die either shows the face (shift k by one) or not
+    distributions = np.zeros((dice_num + 1, face_num))
+    distributions[0] = 1.0
+    for die in matrix:
+        distributions[1:] = distributions[1:] * (1 - die) + distributions[:-1] * die
+        distributions[0] = distributions[0] * (1 - die)
+    distributions.flags.writeable = False
+    return distributions
+
+
+class ExactAnalyzer:
+    """
+    An ExactAnalyzer computes the statistics of an Analyzer as exact probabilities, straight from the weights of the dice
+    of a game, instead of counting them in simulated rolls. Jackpot and face probabilities have closed forms for any game.
+    Combination and permutation probabilities are computed by enumeration when the number of permutations is small
+    enough, and estimated by simulation otherwise. Results are memoized per set of weights.
+
+    ATTRIBUTES:
+        game(Game): The game whose dice define the probabilities. The game does not need to be played.
+
+        max_outcomes(int): The largest number of permutations (faces ** dice) that is enumerated exactly.
+
+        fallback_rolls(int): The number of rolls simulated to estimate combinations and permutations beyond max_outcomes.
+
+        is_exact(bool): Whether combo_count and permutation_count are exact for this game.
+
+    METHODS:
+        __init__ (self, game_object, max_outcomes = 10**6, fallback_rolls = 10**6): Initializes the analyzer with a game.
+
+        jackpot (self): Returns the probability that a roll is a jackpot.
+
+        jackpot_faces (self): Returns the probability of a jackpot of each face.
+
+        face_count (self): Returns the probability that each face shows up on exactly k dice of a roll.
+
+        face_histogram (self): Returns the expected number of times each face shows up in a roll.
+
+        combo_count (self, rng = None): Returns the probability of every combination of faces.
+
+        permutation_count (self, rng = None): Returns the probability of every permutation of faces.
+
+    """
+
+    def __init__(self, game_object, max_outcomes = 10**6, fallback_rolls = 10**6):
+        """
+        PURPOSE: Takes a game object and initializes the analyzer with it.
+
+        INPUTS:
+            game_object(Game): A game object.
+            max_outcomes(int): The largest number of permutations that is enumerated exactly. Defaults to 10**6.
+            fallback_rolls(int): The number of rolls simulated beyond max_outcomes. Defaults to 10**6.
+
+        RAISES:
+            ValueError: If the passed value is not a Game object.
+
+        """
+        if type(game_object) is not Game:
+            raise ValueError ("Passed object is not a game object")
+
+        self.game = game_object
+        self.max_outcomes = max_outcomes
+        self.fallback_rolls = fallback_rolls
+
+
+    @property
+    def is_exact(self):
+        """
+        PURPOSE: Tells whether the game is small enough for combo_count and permutation_count to enumerate every permutation.
+        """
+
+        return len(self.game._faces) ** len(self.game.list_of_dice) <= self.max_outcomes
+
+
+    def _probabilities(self):
+        """
+        PURPOSE: Returns the probability of every face of every die, with faces in the order of the face codes of the game.
+
+        OUTPUTS:
+            np.ndarray: A dice x faces array of probabilities.
+        """
+
+        matrix = np.empty((len(self.game.list_of_dice), len(self.game._faces)))
+        for i, die in enumerate(self.game.list_of_dice):
+            matrix[i, self.game._face_codes] = die._probabilities()
+        return matrix
+
+
+    def _key(self):
+        """
+        PURPOSE: Returns the arguments that identify the current weights of the game to the memoized functions.
+
+        OUTPUTS:
+            Tuple: (probabilities as bytes, number of dice, number of faces).
+        """
+
+        matrix = self._probabilities()
+        return matrix.tobytes(), matrix.shape[0], matrix.shape[1]
+
+
+    def jackpot(self):
+        """
+        PURPOSE: Computes the probability that a roll is a jackpot: the sum over faces of the product of each die's probability of that face.
+
+        OUTPUTS:
+            Float: The jackpot probability. Multiply by a number of rolls to get the expected number of jackpots.
+        """
+
+        return float(self._probabilities().prod(axis = 0).sum())
+
+
+    def jackpot_faces(self):
+        """
+        PURPOSE: Computes the probability of a jackpot of each face.
+
+        OUTPUTS:
+            pd.Series: The probability of a jackpot per face, indexed by face values.
+        """
+
+        return pd.Series(self._probabilities().prod(axis = 0), index = pd.Index(self.game._faces, name = "face values"),
+                         name = 'Probability')
+
+
+    def face_count(self):
+        """
+        PURPOSE: Computes the distribution of the number of dice showing each face in a roll.
+
+        OUTPUTS:
+            pd.DataFrame: A data frame indexed by the number of dice (0 to the number of dice), with face values as columns
+            and probabilities in the cells. Each column sums to 1.
+        """
+
+        return pd.DataFrame(_face_distributions(*self._key()),
+                            index = pd.RangeIndex(len(self.game.list_of_dice) + 1, name = 'count'),
+                            columns = pd.Index(self.game._faces, name = "face values"))
+
+
+    def face_histogram(self):
+        """
+        PURPOSE: Computes how many times each face is expected to show up in a roll.
+
+        OUTPUTS:
+            pd.Series: The expected number of dice showing each face, indexed by face values.
+        """
+
+        return pd.Series(self._probabilities().sum(axis = 0), index = pd.Index(self.game._faces, name = "face values"),
+                         name = 'Expected')
+
+
+    def _estimate(self, rng, ordered):
+        """
+        PURPOSE: Estimates combination or permutation probabilities by simulating fallback_rolls rolls in constant memory.
+        The most recent play of the game is left untouched.
+
+        INPUTS:
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from.
+            ordered (bool): Estimate permutations if True, combinations otherwise.
+
+        OUTPUTS:
+            pd.DataFrame: The estimated probabilities in a 'Probability' column.
+        """
+
+        stream = StreamAnalyzer(self.game).run(self.fallback_rolls, rng = rng)
+        counts = stream.permutation_count() if ordered else stream.combo_count()
+        return (counts['Count'] / stream.rolls).to_frame('Probability')
+
+
+    def combo_count(self, rng = None):
+        """
+        PURPOSE: Computes the probability of every combination of faces (order-independent, with repetitions) that can be rolled.
+
+        INPUTS:
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed for the simulation used when the game
+            is too large to enumerate. Defaults to None.
+
+        OUTPUTS:
+            pd.DataFrame: A data frame of combination probabilities in a 'Probability' column, indexed like Analyzer.combo_count.
+        """
+
+        if not self.is_exact:
+            return self._estimate(rng, ordered = False)
+
+        key = self._key()
+        outcomes = _permutation_probabilities(*key)
+        possible = np.flatnonzero(outcomes)
+        rows = _decode_keys(possible, key[2], key[1], self.game._code_dtype)
+        rows, probabilities = _count_rows(rows, key[2], ordered = False, weights = outcomes[possible])
+        return _counts_frame(rows, probabilities, self.game._faces).rename(columns = {'Count': 'Probability'})
+
+
+    def permutation_count(self, rng = None):
+        """
+        PURPOSE: Computes the probability of every permutation of faces (order-dependent, with repetitions) that can be rolled.
+
+        INPUTS:
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed for the simulation used when the game
+            is too large to enumerate. Defaults to None.
+
+        OUTPUTS:
+            pd.DataFrame: A data frame of permutation probabilities in a 'Probability' column, indexed like Analyzer.permutation_count.
+        """
+
+        if not self.is_exact:
+            return self._estimate(rng, ordered = True)
+
+        key = self._key()
+        outcomes = _permutation_probabilities(*key)
+        possible = np.flatnonzero(outcomes)
+        rows = _decode_keys(possible, key[2], key[1], self.game._code_dtype)
+        return _counts_frame(rows, outcomes[possible], self.game._faces).rename(columns = {'Count': 'Probability'})
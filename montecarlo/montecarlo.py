@@ -1,6 +1,537 @@
+import ast
+import os
+import zipfile
+from collections import OrderedDict
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+
 import pandas as pd
 import numpy as np
 
+from .profiling import _phase, _count, _timed
+
+
+_BLOCK_ROLLS = 1 << 16          #Rolls per independently seeded block. Fixed, so results do not depend on the number of workers
+
+
+def _as_generator(rng = None):
+    """
+    PURPOSE: Turn the rng argument accepted by the sampling methods into a NumPy Generator.
+    
+    INPUTS:
+        rng (None, int or np.random.Generator): A seed or an existing generator. When None, the generator is seeded 
+        from NumPy's global random state so that np.random.seed() still makes rolls reproducible.
+        
+    OUTPUTS:
+        np.random.Generator: A generator to draw uniform numbers from.
+    """
+    
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        rng = np.random.randint(0, 2**63 - 1, dtype = np.int64)
+    return np.random.default_rng(rng)
+
+
+def _as_seed_sequence(rng = None):
+    """
+    PURPOSE: Turn the rng argument accepted by Game.play into the root SeedSequence that the seeds of all blocks of rolls are derived from.
+    
+    INPUTS:
+        rng (None, int, np.random.SeedSequence or np.random.Generator): A seed, a seed sequence or a generator. A generator is 
+        advanced by one draw to seed the sequence. When None, the sequence is seeded from NumPy's global random state.
+        
+    OUTPUTS:
+        np.random.SeedSequence: A fresh root seed sequence.
+    """
+    
+    if isinstance(rng, np.random.SeedSequence):
+        return np.random.SeedSequence(rng.entropy, spawn_key = rng.spawn_key)
+    if isinstance(rng, np.random.Generator):
+        return np.random.SeedSequence(int(rng.integers(0, 2**63 - 1)))
+    if rng is None:
+        rng = int(np.random.randint(0, 2**63 - 1, dtype = np.int64))
+    return np.random.SeedSequence(rng)
+
+
+def _block_seed(root, block):
+    """
+    PURPOSE: Returns the seed of one block of rolls. Equivalent to the block-th child spawned from root, but without 
+    changing the state of root, so any block can be seeded in any order and on any worker.
+    
+    INPUTS:
+        root (np.random.SeedSequence): The root seed sequence of the play.
+        block (int): The position of the block.
+        
+    OUTPUTS:
+        np.random.SeedSequence: The seed sequence of the block.
+    """
+    
+    return np.random.SeedSequence(root.entropy, spawn_key = root.spawn_key + (block,))
+
+
+def _block_sizes(rolls):
+    """
+    PURPOSE: Splits a number of rolls into blocks of _BLOCK_ROLLS rolls (the last block may be shorter).
+    
+    INPUTS:
+        rolls (int): The total number of rolls.
+        
+    OUTPUTS:
+        List: A list of (start, size) pairs, one per block.
+    """
+    
+    return [(start, min(_BLOCK_ROLLS, rolls - start)) for start in range(0, rolls, _BLOCK_ROLLS)]
+
+
+#Game and sampling plan of the current worker process, sent once when the process pool starts
+_worker_game = None
+_worker_plan = None
+
+
+def _init_worker(game, plan = None):
+    """
+    PURPOSE: Stores the game to sample from in a worker process of a parallel play.
+    
+    INPUTS:
+        game (Game): A game without play results.
+        plan (dict): The sampling plan of the play, see Game._sampling_plan. Defaults to None for plain sampling.
+    """
+    
+    global _worker_game, _worker_plan
+    _worker_game = game
+    _worker_plan = plan if plan is not None else game._sampling_plan()
+
+
+def _play_block(task):
+    """
+    PURPOSE: Samples one block of rolls in a worker process.
+    
+    INPUTS:
+        task (Tuple): (size, seed), the number of rolls of the block and its seed sequence.
+        
+    OUTPUTS:
+        Tuple: (codes, weights), a size x dice array of face codes and the likelihood ratio of every roll (None 
+        unless importance sampling).
+    """
+    
+    size, seed = task
+    return _worker_game._sample_block(size, np.random.default_rng(seed), _worker_plan)
+
+
+def _analyze_blocks(task, game = None):
+    """
+    PURPOSE: Samples several blocks of rolls in a worker process (or an executor thread) and returns their running statistics.
+    
+    INPUTS:
+        task (Tuple): (blocks, track_combos), a list of (size, seed) pairs and whether to count combinations.
+        game (Game): The game to sample from. Defaults to None for the game of the worker process.
+        
+    OUTPUTS:
+        StreamAnalyzer: The statistics of the blocks, detached from the game to keep the result small.
+    """
+    
+    blocks, track_combos = task
+    game = _worker_game if game is None else game
+    analyzer = StreamAnalyzer(game, track_combos)
+    for codes in game._iter_blocks(blocks):
+        analyzer.update(codes)
+    analyzer.game = None
+    return analyzer
+
+
+def _worker_count(workers):
+    """
+    PURPOSE: Resolves the workers argument of the parallel methods.
+    
+    INPUTS:
+        workers (None or int): The number of processes, or None for one per CPU.
+        
+    OUTPUTS:
+        Int: The number of processes to use.
+        
+    RAISES:
+        ValueError: If workers is not a positive integer.
+    """
+    
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers should be a positive integer")
+    return workers
+
+
+#Names of the shared memory blocks created by this process
+_owned_blocks = set()
+
+
+def _attach_shared_memory(name):
+    """
+    PURPOSE: Attaches to an existing shared memory block without taking ownership of it, so that the block is not 
+    unlinked when the attaching process exits. Only the process that created the block unlinks it.
+    
+    INPUTS:
+        name (str): The name of the shared memory block.
+        
+    OUTPUTS:
+        shared_memory.SharedMemory: The attached block.
+    """
+    
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)        #Python 3.13+
+    except TypeError:
+        block = shared_memory.SharedMemory(name = name)
+        
+        #Before 3.13 attaching registers the block with the resource tracker, which unlinks it when the process exits. 
+        #Worker processes share the tracker of their parent, so only unrelated processes need to undo the registration
+        if name not in _owned_blocks and mp.parent_process() is None:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _npz_path(path):
+    """
+    PURPOSE: Adds the .npz suffix to a path that lacks it, the way np.savez names the files it writes.
+    
+    INPUTS:
+        path (str or os.PathLike): The path of a saved play.
+        
+    OUTPUTS:
+        str: The path, ending in .npz.
+    """
+    
+    path = os.fspath(path)
+    return path if path.endswith('.npz') else path + '.npz'
+
+
+def _memmap_npz_member(path, member):
+    """
+    PURPOSE: Memory-maps an array stored without compression inside an .npz file, so it can be read without loading it.
+    
+    INPUTS:
+        path (str or os.PathLike): The .npz file.
+        member (str): The name of the array in the file.
+        
+    OUTPUTS:
+        np.memmap: A read-only memory map of the array, or None if the array is compressed.
+    """
+    
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    
+    with open(path, 'rb') as file:
+        #Skip the local file header of the member: 30 fixed bytes followed by the file name and an extra field
+        file.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(file.read(4), dtype = '<u2')
+        file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+        
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    
+    return np.memmap(path, dtype = dtype, mode = 'r', offset = offset, shape = shape, order = 'F' if fortran_order else 'C')
+
+
+def _stratified_uniforms(rng, shape, sampling):
+    """
+    PURPOSE: Draws uniform numbers with a variance-reduction design, one independent design per column.
+    
+    INPUTS:
+        rng (np.random.Generator): The generator to draw from.
+        shape (Tuple): (rolls, columns), the shape of the array of uniform numbers.
+        sampling (str): 'antithetic' to pair every number u with its mirror image, or 'stratified' to put exactly one 
+        number in each of rolls equal strata of [0, 1) (a Latin hypercube design).
+        
+    OUTPUTS:
+        np.ndarray: The uniform numbers, all in [0, 1).
+    """
+    
+    rolls, columns = shape
+    largest = 1.0 - 2.0**-53                   #largest double below 1.0; random() draws multiples of 2**-53
+    
+    if sampling == 'antithetic':
+        half = rng.random(((rolls + 1) // 2, columns))
+        return np.concatenate([half, largest - half])[:rolls]
+    
+    # Stratified: a random stratum per roll in every column, and a random position within the stratum
+    strata = rng.permuted(np.broadcast_to(np.arange(rolls)[:, None], shape), axis = 0)
+    return np.minimum((strata + rng.random(shape)) / rolls, largest)
+
+
+def _code_dtype(face_num):
+    """
+    PURPOSE: Returns the smallest unsigned integer type that can hold the code of every face of a die.
+    
+    INPUTS:
+        face_num (int): The number of faces.
+        
+    OUTPUTS:
+        np.dtype: uint8, uint16 or uint32.
+    """
+    
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if face_num <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    raise ValueError("Too many faces to encode")
+
+
+def _jackpot_mask(codes):
+    """
+    PURPOSE: Flags the rolls in which every die shows the same face, comparing each column with the first one.
+    
+    INPUTS:
+        codes (np.ndarray): A rolls x dice array of face codes.
+        
+    OUTPUTS:
+        np.ndarray: A boolean array with one entry per roll, True for jackpots.
+    """
+    
+    mask = np.ones(len(codes), dtype = bool)
+    for column in range(1, codes.shape[1]):           #one pass per die keeps the extra memory to a single boolean column
+        mask &= codes[:, column] == codes[:, 0]
+    return mask
+
+
+def _roll_face_counts(codes, face_num, offset = 0):
+    """
+    PURPOSE: Counts how many dice show each face in each roll, keeping only the faces that actually show up (a sparse count).
+    
+    INPUTS:
+        codes (np.ndarray): A rolls x dice array of face codes.
+        face_num (int): The number of faces.
+        offset (int): The position of the first roll, added to the roll positions. Defaults to 0.
+        
+    OUTPUTS:
+        Tuple: (rolls, faces, counts) arrays. Roll position rolls[i] shows face code faces[i] on counts[i] dice, 
+        sorted by roll and then by face. The arrays are as narrow as their values allow: int32 roll positions (int64 
+        beyond 2**31 rolls), faces in the dtype of the codes and counts in the smallest unsigned type that holds the 
+        number of dice.
+    """
+    
+    keys = np.arange(len(codes), dtype = np.int64)[:, None] * face_num + codes
+    if codes.size and len(codes) * face_num <= 4 * codes.size:
+        #Few faces per die: a dense histogram over every (roll, face) pair is cheaper than sorting
+        counts = np.bincount(keys.ravel(), minlength = len(codes) * face_num)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts = True)
+    
+    roll_dtype = np.int32 if offset + len(codes) <= np.iinfo(np.int32).max else np.int64
+    rolls = (keys // face_num + offset).astype(roll_dtype)
+    faces = (keys % face_num).astype(codes.dtype)
+    return rolls, faces, counts.astype(np.min_scalar_type(codes.shape[1]))
+
+
+def _interval_half_width(estimate, variance, rolls, confidence):
+    """
+    PURPOSE: Computes the half width of a normal confidence interval for a mean over rolls.
+    
+    INPUTS:
+        estimate (float or np.ndarray): The estimated mean.
+        variance (float or np.ndarray): The variance of a single roll.
+        rolls (int): The number of rolls.
+        confidence (float): The confidence level, e.g. 0.95.
+        
+    OUTPUTS:
+        float or np.ndarray: The half width of the interval; infinite before any roll.
+    """
+    
+    if rolls == 0:
+        return np.inf * np.ones_like(estimate)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return z * np.sqrt(np.maximum(variance, 0) / rolls)
+
+
+def _wilson_half_width(rate, rolls, confidence):
+    """
+    PURPOSE: Computes the half width of a Wilson score confidence interval for a rate, which stays meaningful when the 
+    rate is zero.
+    
+    INPUTS:
+        rate (float or np.ndarray): The observed fraction of rolls.
+        rolls (int): The number of rolls, at least one.
+        confidence (float): The confidence level, e.g. 0.95.
+        
+    OUTPUTS:
+        float or np.ndarray: The half width of the interval around the Wilson center.
+    """
+    
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return z / (1 + z**2 / rolls) * np.sqrt(rate * (1 - rate) / rolls + z**2 / (4 * rolls**2))
+
+
+def _row_keys(codes, face_num):
+    """
+    PURPOSE: Packs every row of face codes into a single integer, reading the row as a number written in base face_num.
+    
+    INPUTS:
+        codes (np.ndarray): A rolls x dice array of face codes.
+        face_num (int): The number of faces, i.e. the radix.
+        
+    OUTPUTS:
+        np.ndarray: An int64 key per roll, or None if face_num ** dice does not fit in 63 bits. Keys sort in the same 
+        lexicographic order as the rows.
+    """
+    
+    if face_num ** codes.shape[1] > 2**63:
+        return None
+    
+    keys = np.zeros(len(codes), dtype = np.int64)
+    for column in range(codes.shape[1]):
+        keys *= face_num
+        keys += codes[:, column]
+    return keys
+
+
+def _decode_keys(keys, face_num, dice_num, dtype):
+    """
+    PURPOSE: Unpacks integer row keys made by _row_keys back into rows of face codes.
+    
+    INPUTS:
+        keys (np.ndarray): Integer row keys.
+        face_num (int): The number of faces, i.e. the radix.
+        dice_num (int): The number of dice, i.e. the number of digits.
+        dtype (np.dtype): The dtype of the face codes.
+        
+    OUTPUTS:
+        np.ndarray: A len(keys) x dice_num array of face codes.
+    """
+    
+    keys = keys.copy()
+    rows = np.empty((len(keys), dice_num), dtype = dtype)
+    for column in reversed(range(dice_num)):
+        rows[:, column] = keys % face_num
+        keys //= face_num
+    return rows
+
+
+def _count_rows(codes, face_num, ordered = True, weights = None):
+    """
+    PURPOSE: Counts the distinct rows of an array of face codes.
+    
+    INPUTS:
+        codes (np.ndarray): A rolls x dice array of face codes.
+        face_num (int): The number of faces.
+        ordered (bool): If False, the codes of each row are sorted first so that rows are counted as combinations 
+        instead of permutations. Defaults to True.
+        weights (np.ndarray): How much each row counts for, e.g. the counts of rows that were already aggregated. 
+        Defaults to None, where every row counts once.
+        
+    OUTPUTS:
+        Tuple: (rows, counts), the distinct rows of codes in lexicographic order and how many times each one occurs.
+    """
+    
+    if not ordered:
+        codes = np.sort(codes, axis = 1)
+    
+    keys = _row_keys(codes, face_num)
+    if keys is None:
+        #Too many possible rows to pack into one integer, so fall back to comparing whole rows
+        rows, inverse = np.unique(codes, axis = 0, return_inverse = True)
+        return rows, _sum_by(inverse.ravel(), weights, len(rows))
+    
+    space = face_num ** codes.shape[1]
+    if space <= 4 * len(keys) + 65536:
+        #Small key space: a histogram over every possible key is cheaper than sorting the keys
+        counts = _sum_by(keys, weights, space)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, inverse = np.unique(keys, return_inverse = True)
+        counts = _sum_by(inverse, weights, len(keys))
+    return _decode_keys(keys, face_num, codes.shape[1], codes.dtype), counts
+
+
+def _sum_by(labels, weights, length):
+    """
+    PURPOSE: Adds up the weights of each label, like np.bincount, but keeps integer weights as integers.
+    
+    INPUTS:
+        labels (np.ndarray): Non-negative integer labels.
+        weights (np.ndarray): The weight of each label, or None to count every label once.
+        length (int): The number of possible labels.
+        
+    OUTPUTS:
+        np.ndarray: The total weight of every label from 0 to length - 1.
+    """
+    
+    if weights is None:
+        return np.bincount(labels, minlength = length)
+    if np.issubdtype(weights.dtype, np.integer):
+        totals = np.zeros(length, dtype = np.int64)
+        np.add.at(totals, labels, weights)
+        return totals
+    return np.bincount(labels, weights = weights, minlength = length)
+
+
+def _counts_frame(rows, counts, faces):
+    """
+    PURPOSE: Builds the data frame returned by combo_count and permutation_count from distinct rows of face codes.
+    
+    INPUTS:
+        rows (np.ndarray): Distinct rows of face codes, one column per die.
+        counts (np.ndarray): The number of times each row occurred (or its weight or probability).
+        faces (np.ndarray): The face lookup table to decode the codes with.
+        
+    OUTPUTS:
+        pd.DataFrame: A data frame with a 'Count' column, indexed by the face of each die (a MultiIndex for two or more dice).
+    """
+    
+    levels = [faces[rows[:, column]] for column in range(rows.shape[1])]
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name = 1)
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names = list(range(1, len(levels) + 1)))
+    if np.issubdtype(counts.dtype, np.integer):
+        counts = counts.astype(np.int64)
+    return pd.DataFrame({'Count': counts}, index = index)
+
+
+#Face lookup tables shared by the dice built from the same faces, keyed by the dtype and bytes of the faces
+_face_indexes = OrderedDict()
+_FACE_INDEXES_MAX = 64
+
+
+def _face_index(faces):
+    """
+    PURPOSE: Returns the face -> position lookup table of an array of faces, checking that the faces are distinct. The 
+    table is built once per set of faces, so dice built from the same faces share it.
+    
+    INPUTS:
+        faces (np.ndarray): The faces of a die.
+        
+    OUTPUTS:
+        dict: The position of every face in the array.
+        
+    RAISES:
+        ValueError: If the faces are not distinct (NaN faces count as equal, as for np.unique).
+    """
+    
+    #The bytes of an object array are pointers rather than faces, so those are never cached
+    key = (faces.dtype.str, faces.shape, faces.tobytes()) if faces.dtype != object else None
+    if key in _face_indexes:
+        _face_indexes.move_to_end(key)
+        return _face_indexes[key]
+    
+    index = {face: i for i, face in enumerate(faces.tolist())}
+    if len(index) != len(faces) or (faces.dtype.kind in 'fc' and np.isnan(faces).sum() > 1):
+        raise ValueError ("Values should be distinct")
+    
+    if key is not None:
+        _face_indexes[key] = index
+        if len(_face_indexes) > _FACE_INDEXES_MAX:
+            _face_indexes.popitem(last = False)
+    return index
+
+
 class Dice:
     
     """
@@ -8,23 +539,34 @@ class Dice:
     all faces have equal weight of 1.0, but can be changed after the object is created. Each side of a die contains a
     unique symbol. Symbols may be alphabetic or numeric. The die has one behavior, which is to be rolled one or more times.
     
+    The die is backed by arrays: the faces, a vector of weights and a face -> position lookup table shared by the dice
+    built from the same faces. The pandas view of the die is only built when it is asked for.
+    
     ATTRIBUTES:
         faces(np.ndarray): The faces of the die passed as a NumPy array. Could be numeric or strings.
         
-        weights (np.ndarray): The weights for each face, defaults to 1.0 for all faces. Can be changed later.
+        weights (np.ndarray): The weights for each face, defaults to 1.0 for all faces. Change it with change_weight 
+        or set_weights, which keep the sampling tables in step.
         
-        _my_die (pd.DataFrame): A private pandas DataFrame that contains faces and their weights.
+        _my_die (pd.DataFrame): A private pandas DataFrame that contains faces and their weights, built on demand.
         
     METHODS:
         __init__(self, face_array): Initializes the Dice object with faces and sets all weights to 1.0.
         
         change_weight(side, new_weight): Changes the weight of a given face.
         
-        roll_the_die(rolls = 1): Rolls the die a specific number of times, and returns a list of outcomes.
+        set_weights(weights, sides = None): Changes the weights of many faces (or all of them) at once.
+        
+        roll_the_die(rolls = 1, as_array = False, rng = None): Rolls the die a specific number of times, and returns a list 
+        (or NumPy array) of outcomes.
             
         die_current_state(): Returns a copy of the current state of the die.
     """
     
+    _ALIAS_MIN_FACES = 16           #From this many faces on, rolls are drawn with the alias table
+    
+    __slots__ = ('faces', 'weights', '_index', '_cache')
+    
 
     def __init__ (self, face_array):
         """
@@ -44,20 +586,51 @@ class Dice:
             raise TypeError ("Argument should be a numpy array")    
         
         
-        #Check that all values in the array are distinct 
-        if len(np.unique(face_array)) != len(face_array):         
-            raise ValueError ("Values should be distinct")
+        #Check that all values in the array are distinct, while building the face lookup table
+        self._index = _face_index(face_array)
         
         self.faces = face_array
         self.weights = np.ones(len(face_array))     #Set default weight of 1.0 for each face
         
-        #Save faces and weights in a private data frame with face as index
-        self._my_die = pd.DataFrame({                   
-        'faces': self.faces,
-        'weights': self.weights
-    },
-        index = self.faces)
+        self._cache = {}        #Sampling tables derived from the weights, rebuilt after a weight change
+    
+    
+    @property
+    def _my_die(self):
+        """
+        PURPOSE: The private data frame of faces and their weights, with face as index. Built on first use and cached until 
+        the weights change; change the weights through change_weight or set_weights rather than through this frame.
+        """
+        
+        if 'frame' not in self._cache:
+            self._cache['frame'] = pd.DataFrame({                   
+                'faces': self.faces,
+                'weights': self.weights.copy()
+            },
+                index = self.faces)
+        return self._cache['frame']
+    
+    
+    def _positions(self, sides):
+        """
+        PURPOSE: Looks up the positions of faces in self.faces.
+        
+        INPUTS:
+            sides (array-like): The faces to look up.
+            
+        OUTPUTS:
+            np.ndarray: The position of every face.
+            
+        RAISES:
+            IndexError: If a face is not a face of the die.
+        """
         
+        try:
+            return np.array([self._index[side] for side in np.asarray(sides).tolist()], dtype = np.intp)
+        except (KeyError, TypeError):
+            raise IndexError("Face passed is not a valid value")
+    
+    
     def change_weight(self, side, new_weight):
         """
         PURPOSE: Change the weight of a given face of the die
@@ -72,8 +645,7 @@ class Dice:
         """
         
         # Check that side passed is in the die array
-        if side not in self.faces:
-            raise IndexError("Face passed is not a valid value")
+        position = self._positions([side])[0]
         
         type_of_weight = [int, float]     #acceptable types of weights
         
@@ -86,201 +658,1349 @@ class Dice:
         
         
         #Change the weight of for the passed side to the new weight
-        self._my_die.loc[side, 'weights'] = new_weight
+        self.weights[position] = new_weight
+        
+        self._cache.clear()           #The sampling tables no longer match the weights
+    
+    
+    def set_weights(self, weights, sides = None):
+        """
+        PURPOSE: Changes the weights of many faces at once, in one vectorized write.
+        
+        INPUTS:
+            weights (float or array-like): The new weights, one per side (or a single weight for all of them).
+            sides (array-like): The faces to change the weights of. Defaults to None for all faces, in the order of self.faces.
+            
+        RAISES:
+            IndexError: If a side is not a face of the die.
+            TypeError: If the weights are not numeric.
+            ValueError: If the number of weights does not match the number of sides.
+        """
+        
+        try:
+            weights = np.asarray(weights, dtype = float)
+        except (TypeError, ValueError):
+            raise TypeError("New weights should be integers or floats")
+        
+        positions = slice(None) if sides is None else self._positions(sides)
+        try:
+            self.weights[positions] = weights
+        except ValueError:
+            raise ValueError("There should be one weight per side.")
+        
+        self._cache.clear()           #The sampling tables no longer match the weights
+    
+    
+    def _probabilities(self):
+        """
+        PURPOSE: Returns the weights of the die normalized to probabilities. Computed once and cached until the weights change.
+        
+        OUTPUTS:
+            np.ndarray: The probability of each face, in the order of self.faces.
+            
+        RAISES:
+            ValueError: If the weights are negative or do not sum to a positive number.
+        """
+        
+        _count('cache_hits' if 'probs' in self._cache else 'cache_misses')
+        if 'probs' not in self._cache:
+            weights = self.weights
+            total = weights.sum()
+            if (weights < 0).any() or not total > 0:
+                raise ValueError("Weights should be non-negative and sum to a positive number")
+            self._cache['probs'] = weights / total
+        return self._cache['probs']
+    
+    
+    def _cdf(self):
+        """
+        PURPOSE: Returns the cumulative distribution of the faces, cached until the weights change.
+        
+        OUTPUTS:
+            np.ndarray: The cumulative probabilities, set to exactly 1.0 from the last face with a positive weight on.
+        """
+        
+        _count('cache_hits' if 'cdf' in self._cache else 'cache_misses')
+        if 'cdf' not in self._cache:
+            probabilities = self._probabilities()
+            cdf = np.cumsum(probabilities)
+            #guard against rounding so every uniform number maps to a face, and never to a trailing face of zero weight
+            cdf[np.flatnonzero(probabilities)[-1]:] = 1.0
+            self._cache['cdf'] = cdf
+        return self._cache['cdf']
+    
+    
+    def _alias_table(self):
+        """
+        PURPOSE: Returns the Walker/Vose alias table of the die, built once and cached until the weights change. 
+        With the table every draw costs O(1) whatever the number of faces.
+        
+        OUTPUTS:
+            Tuple: (threshold, alias) arrays. Column i is kept when a uniform number falls below threshold[i], 
+            otherwise face alias[i] is returned.
+        """
+        
+        _count('cache_hits' if 'alias' in self._cache else 'cache_misses')
+        if 'alias' not in self._cache:
+            n = len(self.faces)
+            scaled = self._probabilities() * n
+            threshold = np.ones(n)
+            alias = np.arange(n)
+            
+            small = [i for i in range(n) if scaled[i] < 1.0]
+            large = [i for i in range(n) if scaled[i] >= 1.0]
             
+            # Pair every under-full column with an over-full face that tops it up (Vose's method)
+            while small and large:
+                s, l = small.pop(), large.pop()
+                threshold[s] = scaled[s]
+                alias[s] = l
+                scaled[l] = scaled[l] + scaled[s] - 1.0
+                if scaled[l] < 1.0:
+                    small.append(l)
+                else:
+                    large.append(l)
+            
+            #Whatever is left over is full up to rounding error, so threshold stays 1.0
+            self._cache['alias'] = (threshold, alias)
+        return self._cache['alias']
+    
+    
+    def _sample_indices(self, rolls, rng = None, method = None):
+        """
+        PURPOSE: Draws the positions (in self.faces) of the rolled faces in one vectorized call.
+        
+        INPUTS:
+            rolls (int or tuple): The number of times to roll the die, or the shape of the array of rolls.
+            rng (None, int or np.random.Generator): Source of randomness. See _as_generator.
+            method (str): 'alias' for the alias table or 'cdf' for the inverse cumulative distribution. Defaults to 
+            'alias' for dice with at least _ALIAS_MIN_FACES faces and 'cdf' otherwise.
             
-    def roll_the_die(self, rolls = 1):
+        OUTPUTS:
+            np.ndarray: An integer array of face positions with one entry per roll.
+        
+        RAISES:
+            ValueError: If method is not 'alias' or 'cdf'.
+        """
+        
+        return self._indices_from_uniforms(_as_generator(rng).random(rolls), method)
+    
+    
+    def _indices_from_uniforms(self, uniforms, method = None):
         """
-        PURPOSE: Roll the die and return a Python list of outcomes.
+        PURPOSE: Turns uniform numbers in [0, 1) into positions (in self.faces) of rolled faces.
         
         INPUTS:
-            rolls (int): The number of times to roll the die. Defaults to 1.
+            uniforms (np.ndarray): The uniform numbers, one per roll.
+            method (str): 'alias' or 'cdf', see _sample_indices. Only 'cdf' is monotone in the uniform numbers, which 
+            antithetic and stratified sampling rely on.
+            
+        OUTPUTS:
+            np.ndarray: An integer array of face positions with the shape of uniforms.
+        
+        RAISES:
+            ValueError: If method is not 'alias' or 'cdf'.
+        """
+        
+        if method is None:
+            method = 'alias' if len(self.faces) >= self._ALIAS_MIN_FACES else 'cdf'
+        
+        if method == 'cdf':
+            #side = 'right' never selects a face with zero weight, since its cdf value equals the one before it
+            return np.searchsorted(self._cdf(), uniforms, side = 'right')
+        elif method == 'alias':
+            # One uniform number picks the column (integer part) and decides between it and its alias (fraction)
+            threshold, alias = self._alias_table()
+            scaled = uniforms * len(self.faces)
+            columns = scaled.astype(np.intp)
+            return np.where(scaled - columns < threshold[columns], columns, alias[columns])
+        else:
+            raise ValueError("Invalid sampling method. Please choose either 'alias' or 'cdf'.")
+            
+            
+    @_timed('Dice.roll_the_die')
+    def roll_the_die(self, rolls = 1, as_array = False, rng = None):
+        """
+        PURPOSE: Roll the die and return a Python list of outcomes. All rolls are drawn in a single vectorized call.
+        
+        INPUTS:
+            rolls (int): The number of times to roll the die. Defaults to 1.
+            as_array (bool): Return a NumPy array instead of a list. Defaults to False.
+            rng (None, int or np.random.Generator): A seed or generator to draw the rolls from. Defaults to None.
+        
+        OUTPUTS: 
+            List: A list of rolled faces (outcomes), or a np.ndarray if as_array is True.
+        """
+        
+        results = self.faces[self._sample_indices(rolls, rng)]
+        _count('rolls', results.size)
+        
+        if as_array:
+            return results
+        return results.tolist()
+    
+    
+    
+    def die_current_state(self):
+        """
+        PURPOSE: Returns a copy of the private die data frame.
+        
+        OUTPUTS:
+            pd.DataFrame: A DataFrame of the die's faces and weights.
+        """
+        
+        # Return a copy of the private die data frame
+        return self._my_die.copy()
+
+ #-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+
+class Game:
+    
+    """
+    Class representing a game consisting of rolling one or more similar dice (Die objects) one or more times. 
+    
+    Each game is initiated with a Python list of one or more dice. Similar dice mean that each die in a given game 
+    has the same number of sides and associated faces, but each die object may have its onw weights. Game objects have 
+    behavior to roll all the dice a given number of times. Game objects only keep the results of their most recent play.
+    
+    ATTRIBUTES:
+        list_of_dice(List): A list of one or more Dice objects that are used in the game. All dice must have the has the same number of sides and associated faces.
+        
+        _play_results(pd.DataFrame): A private DataFrame that stores the results of the most recent play in "wide" format. 
+        Outcomes are stored as compact integer face codes (uint8/uint16), decoded to labels by show_results.
+        
+        _faces(np.ndarray): The face lookup table shared by all dice, in sorted order. Code i stands for face _faces[i].
+        
+        _seed(np.random.SeedSequence): The root seed sequence of the most recent play.
+        
+        _roll_weights(np.ndarray): The likelihood ratio of every roll of the most recent play when it used importance 
+        sampling, None otherwise.
+        
+        _version(int): A counter bumped whenever the results change, which analyzers memoize their statistics against.
+        
+        _appends(dict): For versions made by appending rolls, the version appended to and the first appended row.
+        
+        _views(dict): The read-only decoded face labels and the wide and narrow data frames behind the views returned by 
+        show_results, built on first use and dropped when the results change.
+        
+        _store(dict): Where the face codes of _play_results live when they are not in private memory: a shared memory 
+        block or a memory-mapped file. None by default.
+    
+    METHODS:
+        __int__ (self, dice_list): Initializes a game with a list of Die objects.
+        
+        play(self, rolls, rng = None, workers = 1, store = None, sampling = 'plain', proposal = None, append = False): Rolls all the dice the specified number of times and saves the result of the play to a private data frame in "wide" format.
+        
+        results_handle(self): Returns a small picklable description of results kept in shared memory or in a memory-mapped file.
+        
+        attach_results(self, handle): Wraps the results described by a handle, without copying them.
+        
+        release_views(self): Drops the cached face labels and views of the results; show_results rebuilds them.
+        
+        release_results(self): Drops the results of the most recent play and frees their shared memory block.
+        
+        save(self, path, compressed = False): Saves the dice, the seed and the face codes of the most recent play to an .npz file.
+        
+        load(path, mmap = True): Class method that rebuilds a played game from a file written by save.
+        
+        iter_play(self, rolls, chunk_size = 100000, rng = None, decode = False): Rolls all the dice in chunks and yields each chunk of results.
+        
+        show_results(self, form = 'wide', copy = False): Returns a read-only view (or a copy) of the results of the most recent play in either "wide" or "narrow" format.
+
+    
+    """
+    
+    def __init__(self, dice_list):
+        """
+        PURPOSE: Takes a single parameter, a list of already instantiated similar dice and initializes a Game object with it.
+        
+        INPUTS:
+            dice_list(List): A list of already instantiated similar dice objects.
+            
+        RAISES: 
+            TypeError: If any element in the dice_list is not a Die object.
+            ValueError: If the dice_list is empty or any dice in the list have different faces.
+        """
+        
+        #Check that all elements in dice_list are of class Dice
+        for d in dice_list:
+            if (type(d) is not Dice):
+                raise TypeError ("All elements in the dice list must be objects of the Die Class")
+        
+        #The faces of the game are taken from the dice, so at least one is needed
+        if len(dice_list) == 0:
+            raise ValueError("The dice list should contain at least one die.")
+        
+        
+        
+        # Check that all dice have the same faces. Dice built from the same array share it, so each distinct array is 
+        # compared once
+        checked = {id(dice_list[0].faces)}
+        for die in dice_list[1:]:                    #start from the second die
+            if id(die.faces) not in checked:
+                if not np.array_equal(die.faces, dice_list[0].faces):             #comparing to the first die #*  
+                    raise ValueError("All dice must have the same faces.")
+                checked.add(id(die.faces))
+           
+        
+        #* from: https://stackoverflow.com/questions/10580676/comparing-two-numpy-arrays-for-equality-element-wise
+        
+        
+        #Initialize the list of dice using the given parameter
+        self.list_of_dice = dice_list
+        self._store = None
+        self._roll_weights = None
+        self._version = 0
+        self._appends = {}
+        self._views = {}
+        
+        #Shared face lookup table. Sorting it makes the order of the codes follow the order of the labels
+        first_faces = dice_list[0].faces
+        order = np.argsort(first_faces, kind = 'stable')
+        self._faces = first_faces[order]
+        self._code_dtype = _code_dtype(len(first_faces))
+        
+        #Code of each face position of the dice
+        self._face_codes = np.empty(len(first_faces), dtype = self._code_dtype)
+        self._face_codes[order] = np.arange(len(first_faces))
+        
+        
+    def _decode(self, codes):
+        """
+        PURPOSE: Turns an array of face codes back into face labels.
+        
+        INPUTS:
+            codes (np.ndarray): Integer face codes.
+            
+        OUTPUTS:
+            np.ndarray: The face labels, with the same shape as codes.
+        """
+        
+        return self._faces[codes]
+    
+    
+    def _weight_groups(self, dice = None):
+        """
+        PURPOSE: Groups the dice of the game that share identical weights, so that each group can be sampled in one draw.
+        
+        INPUTS:
+            dice (List): The dice to group, one per column. Defaults to None for list_of_dice.
+        
+        OUTPUTS:
+            List: A list of (die, columns) pairs, where die is the first die of the group and columns are the positions 
+            of all dice of the group in list_of_dice.
+        """
+        
+        groups = {}
+        for i, die in enumerate(self.list_of_dice if dice is None else dice):
+            key = die._probabilities().tobytes()
+            if key not in groups:
+                groups[key] = (die, [])
+            groups[key][1].append(i)
+        return list(groups.values())
+    
+    
+    def _sampling_plan(self, sampling = 'plain', proposal = None):
+        """
+        PURPOSE: Prepares everything needed to sample the blocks of a play with a given sampling mode.
+        
+        INPUTS:
+            sampling (str): 'plain', 'importance', 'stratified' or 'antithetic'. Defaults to 'plain'.
+            proposal (array-like or List): For importance sampling, the tilted weights to roll with: one array of weights 
+            (in the order of the faces of the dice) for every die, or a list with one such array per die.
+            
+        OUTPUTS:
+            dict: The sampling mode, the weight groups of the dice to roll, and for importance sampling the dice x faces 
+            array of log likelihood ratios, indexed by face code.
+            
+        RAISES:
+            ValueError: If the sampling mode is invalid, or the proposal is missing, misshapen or zero where a die is not.
+        """
+        
+        if sampling not in ('plain', 'importance', 'stratified', 'antithetic'):
+            raise ValueError("Invalid sampling. Please choose 'plain', 'importance', 'stratified' or 'antithetic'.")
+        if sampling != 'importance':
+            return {'sampling': sampling, 'groups': self._weight_groups(), 'log_ratios': None}
+        
+        if proposal is None:
+            raise ValueError("Importance sampling needs proposal weights.")
+        proposal = np.asarray(proposal, dtype = float)
+        if proposal.ndim == 1:
+            proposal = np.broadcast_to(proposal, (len(self.list_of_dice), len(proposal)))
+        if proposal.shape != (len(self.list_of_dice), len(self._faces)):
+            raise ValueError("The proposal should have one weight per face, for every die or for each die.")
+        
+        #Dice rolled instead of the game's dice, and the log ratio of the probabilities of every face
+        tilted, log_ratios = [], np.zeros(proposal.shape)
+        for i, die in enumerate(self.list_of_dice):
+            tilted_die = Dice(die.faces)
+            tilted_die.set_weights(proposal[i])
+            target, sampled = die._probabilities(), tilted_die._probabilities()
+            if ((sampled == 0) & (target > 0)).any():
+                raise ValueError("The proposal weights must be positive wherever the die weights are.")
+            with np.errstate(divide = 'ignore'):
+                log_ratios[i, self._face_codes] = np.where(target > 0, np.log(target) - np.log(sampled), -np.inf)
+            tilted.append(tilted_die)
+        
+        return {'sampling': sampling, 'groups': self._weight_groups(tilted), 'log_ratios': log_ratios}
+    
+    
+    def _sample_codes(self, rolls, rng, groups = None, out = None, sampling = 'plain'):
+        """
+        PURPOSE: Samples a rolls x dice matrix of face codes. Dice sharing identical weights are drawn together.
+        
+        INPUTS:
+            rolls (int): The number of times to roll the dice.
+            rng (np.random.Generator): The generator to draw the rolls from.
+            groups (List): The result of _weight_groups, to avoid regrouping the dice on every chunk. Defaults to None.
+            out (np.ndarray): A preallocated rolls x dice array of codes to write into. Defaults to None.
+            sampling (str): 'antithetic' or 'stratified' to draw the uniform numbers with that design (see 
+            _stratified_uniforms); any other value draws them independently. Defaults to 'plain'.
+            
+        OUTPUTS:
+            np.ndarray: The matrix of face codes.
+        """
+        
+        if groups is None:
+            groups = self._weight_groups()
+        if out is None:
+            out = np.empty((rolls, len(self.list_of_dice)), dtype = self._code_dtype)
+        
+        # Roll every group of identically weighted dice in a single draw
+        for die, columns in groups:
+            if sampling in ('antithetic', 'stratified'):
+                uniforms = _stratified_uniforms(rng, (rolls, len(columns)), sampling)
+                indices = die._indices_from_uniforms(uniforms, method = 'cdf')
+            else:
+                indices = die._sample_indices(rolls * len(columns), rng).reshape(rolls, len(columns))
+            out[:, columns] = self._face_codes[indices]
+        return out
+    
+    
+    def _sample_block(self, rolls, rng, plan, out = None):
+        """
+        PURPOSE: Samples one block of rolls following a sampling plan.
+        
+        INPUTS:
+            rolls (int): The number of rolls of the block.
+            rng (np.random.Generator): The generator of the block.
+            plan (dict): The sampling plan, see _sampling_plan.
+            out (np.ndarray): A preallocated rolls x dice array of codes to write into. Defaults to None.
+            
+        OUTPUTS:
+            Tuple: (codes, weights), the face codes and, for importance sampling, the likelihood ratio of every roll 
+            (None otherwise).
+        """
+        
+        codes = self._sample_codes(rolls, rng, plan['groups'], out, plan['sampling'])
+        if plan['log_ratios'] is None:
+            return codes, None
+        
+        # The likelihood ratio of a roll is the product over dice of target over proposal probability of the face rolled
+        log_weights = np.zeros(rolls)
+        for column, log_ratios in enumerate(plan['log_ratios']):
+            log_weights += log_ratios[codes[:, column]]
+        return codes, np.exp(log_weights)
+    
+    
+    def _iter_blocks(self, blocks):
+        """
+        PURPOSE: Samples the rolls of a play block by block, each block from its own generator seeded by _block_seed.
+        
+        INPUTS:
+            blocks (iterable): (size, seed) pairs, one per block.
+            
+        OUTPUTS:
+            Generator: Yields an array of face codes per block.
+        """
+        
+        groups = self._weight_groups()
+        for size, seed in blocks:
+            yield self._sample_codes(size, np.random.default_rng(seed), groups)
+    
+    
+    def _allocate_results(self, rolls, store):
+        """
+        PURPOSE: Allocates the rolls x dice array of face codes of a play, in private memory, shared memory or a memory-mapped file.
+        
+        INPUTS:
+            rolls (int): The number of rolls.
+            store (None, str or os.PathLike): None for private memory, 'shared' for a new shared memory block, or the 
+            path of a file to memory-map (a string path must end in .npy).
+            
+        OUTPUTS:
+            np.ndarray: The array to write the face codes into.
+        """
+        
+        shape = (rolls, len(self.list_of_dice))
+        if store is None:
+            return np.empty(shape, dtype = self._code_dtype)
+        
+        if store == 'shared':
+            block = shared_memory.SharedMemory(create = True, size = max(rolls * shape[1] * self._code_dtype.itemsize, 1))
+            self._store = {'kind': 'shared', 'name': block.name, 'buffer': block, 'owner': True}
+            _owned_blocks.add(block.name)
+            return np.ndarray(shape, dtype = self._code_dtype, buffer = block.buf)
+        
+        path = os.fspath(store)
+        self._store = {'kind': 'memmap', 'path': path}
+        return np.lib.format.open_memmap(path, mode = 'w+', dtype = self._code_dtype, shape = shape)
+    
+    
+    def _wrap_results(self, outcomes, appended_to = None):
+        """
+        PURPOSE: Saves an array of face codes as the results of the most recent play, without copying it, and bumps the 
+        version of the results.
+        
+        INPUTS:
+            outcomes (np.ndarray): A rolls x dice array of face codes.
+            appended_to (Tuple): (version, start) when outcomes are the results of that version followed by new rolls 
+            from row start on. Defaults to None for brand new results.
+        """
+        
+        self._play_results = pd.DataFrame(outcomes, 
+                                          index = pd.RangeIndex(1, len(outcomes) + 1, name = 'rolls'), 
+                                          columns = pd.RangeIndex(1, len(self.list_of_dice) + 1, name = 'die'), 
+                                          copy = False)
+        self._version += 1
+        self._views = {}
+        if appended_to is None:
+            self._appends = {}
+        else:
+            self._appends[self._version] = appended_to
+    
+    
+    def _appended_since(self, version):
+        """
+        PURPOSE: Finds the rolls added since an earlier version of the results, when they were only appended to.
+        
+        INPUTS:
+            version (int): The earlier version.
+            
+        OUTPUTS:
+            int: The first row of the rolls added since that version, or None if the results were replaced since.
+        """
+        
+        current, start = self._version, len(self._play_results)
+        while current != version:
+            if current not in self._appends:
+                return None
+            current, start = self._appends[current]
+        return start
+    
+    
+    def results_handle(self):
+        """
+        PURPOSE: Returns a small picklable description of the results of the most recent play when they are kept in shared 
+        memory or in a memory-mapped file. Another process can pass it to attach_results to read the same results without a copy.
+        
+        OUTPUTS:
+            dict: The kind of store, its name or path, and the shape and dtype of the face codes.
+            
+        RAISES:
+            ValueError: If the game has not been played with store = 'shared' or a file path.
+        """
+        
+        if self._store is None or not hasattr(self, '_play_results'):
+            raise ValueError("Only results played with store = 'shared' or a file path have a handle.")
+        
+        handle = {key: value for key, value in self._store.items() if key in ('kind', 'name', 'path')}
+        handle['shape'] = self._play_results.shape
+        handle['dtype'] = self._code_dtype.str
+        return handle
+    
+    
+    def attach_results(self, handle):
+        """
+        PURPOSE: Uses the results described by a handle from results_handle as the results of this game, without copying them.
+        The results are attached read-only and the shared memory block stays owned by the game that created it.
+        
+        INPUTS:
+            handle (dict): A handle returned by results_handle.
+            
+        RAISES:
+            ValueError: If the handle does not match the number of dice of the game.
+        """
+        
+        if handle['shape'][1] != len(self.list_of_dice):
+            raise ValueError("The handle does not match the number of dice of the game.")
+        
+        self.release_results()
+        if handle['kind'] == 'shared':
+            block = _attach_shared_memory(handle['name'])
+            self._store = {'kind': 'shared', 'name': handle['name'], 'buffer': block, 'owner': False}
+            outcomes = np.ndarray(handle['shape'], dtype = handle['dtype'], buffer = block.buf)
+        else:
+            self._store = {'kind': 'memmap', 'path': handle['path']}
+            outcomes = np.load(handle['path'], mmap_mode = 'r')
+        outcomes.flags.writeable = False
+        self._wrap_results(outcomes)
+    
+    
+    def release_views(self):
+        """
+        PURPOSE: Drops the cached face labels and views of the results, freeing their memory. They are rebuilt on the next 
+        call of show_results; the results themselves are kept.
+        """
+        
+        self._views = {}
+    
+    
+    def release_results(self):
+        """
+        PURPOSE: Drops the results of the most recent play. A shared memory block created by this game is unlinked, so it is 
+        freed once every process has let go of it. Memory-mapped files are kept on disk.
+        """
+        
+        if hasattr(self, '_play_results'):
+            del self._play_results
+        self._roll_weights = None
+        self._version += 1
+        self._views = {}
+        
+        store, self._store = self._store, None
+        if store is not None and store['kind'] == 'shared':
+            try:
+                store['buffer'].close()
+            except BufferError:
+                pass                            #views of the results are still alive; the mapping goes away with them
+            if store['owner']:
+                store['buffer'].unlink()
+                _owned_blocks.discard(store['name'])
+    
+    
+    def save(self, path, compressed = False):
+        """
+        PURPOSE: Saves the most recent play to a compact binary .npz file: the integer face codes, the face table, 
+        the current weights of every die, the seed of the play and, after importance sampling, the likelihood ratio of 
+        every roll. Face labels are never written per roll.
+        
+        INPUTS:
+            path (str or os.PathLike): The file to write. The .npz suffix is added when missing.
+            compressed (bool): Compress the file. Compressed files are smaller but cannot be memory-mapped by load. Defaults to False.
+            
+        RAISES:
+            ValueError: If the game has not been played yet.
+            TypeError: If the faces are neither numeric nor strings.
+        """
+        
+        if not hasattr(self, '_play_results'):
+            raise ValueError("The play method must be called before saving results.")
+        
+        path = _npz_path(path)
+        faces = self.list_of_dice[0].faces
+        if faces.dtype == object:
+            if not all(isinstance(face, str) for face in faces):
+                raise TypeError("Only numeric or string faces can be saved")
+            faces = faces.astype(str)
+        
+        seed = getattr(self, '_seed', None)
+        arrays = {
+            'codes': self._play_results.to_numpy(),
+            'faces': faces,
+            'weights': np.array([die.weights for die in self.list_of_dice]),
+            'seed_entropy': np.array(repr(seed.entropy) if seed is not None else ''),
+            'seed_spawn_key': np.array(seed.spawn_key if seed is not None else (), dtype = np.int64),
+        }
+        if self._roll_weights is not None:
+            arrays['roll_weights'] = self._roll_weights
+        
+        if compressed:
+            np.savez_compressed(path, **arrays)
+        else:
+            np.savez(path, **arrays)
+    
+    
+    @classmethod
+    def load(cls, path, mmap = True):
+        """
+        PURPOSE: Rebuilds a played game from a file written by save. The dice are recreated with their saved weights, and 
+        the face codes are memory-mapped when the file is not compressed, so an Analyzer can compute statistics over 
+        the saved play without reading it all into memory or decoding it to labels.
+        
+        INPUTS:
+            path (str or os.PathLike): The file written by save, with or without its .npz suffix.
+            mmap (bool): Memory-map the face codes instead of loading them. Defaults to True.
+            
+        OUTPUTS:
+            Game: The game, with the saved play as its most recent play.
+        """
+        
+        path = _npz_path(path)
+        with np.load(path, allow_pickle = False) as saved:
+            faces = saved['faces']
+            weights = saved['weights']
+            entropy = str(saved['seed_entropy'])
+            spawn_key = tuple(int(key) for key in saved['seed_spawn_key'])
+            codes = _memmap_npz_member(path, 'codes') if mmap else None
+            if codes is None:
+                codes = saved['codes']
+            roll_weights = saved['roll_weights'] if 'roll_weights' in saved else None
+        
+        dice = []
+        for die_weights in weights:
+            die = Dice(faces)
+            die.set_weights(die_weights)
+            dice.append(die)
+        
+        game = cls(dice)
+        game._wrap_results(codes)
+        game._roll_weights = roll_weights
+        if entropy:
+            game._seed = np.random.SeedSequence(ast.literal_eval(entropy), spawn_key = spawn_key)
+        return game
+    
+    
+    def __getstate__(self):
+        """
+        PURPOSE: Pickles the game. Results kept in shared memory or in a memory-mapped file are pickled as a handle instead 
+        of a copy of the data, so processes receiving the game attach to the same results.
+        """
+        
+        state = self.__dict__.copy()
+        if self._store is not None and '_play_results' in state:
+            state['_results_handle'] = self.results_handle()
+            del state['_play_results']
+        state['_store'] = None
+        state['_views'] = {}                    #rebuilt on demand from the results
+        return state
+    
+    
+    def __setstate__(self, state):
+        """
+        PURPOSE: Unpickles the game, attaching to results that were pickled as a handle.
+        """
+        
+        handle = state.pop('_results_handle', None)
+        self.__dict__.update(state)
+        if handle is not None:
+            self.attach_results(handle)
+            self._roll_weights = state.get('_roll_weights')
+    
+    
+    @_timed('Game.play')
+    def play(self, rolls, rng = None, workers = 1, store = None, sampling = 'plain', proposal = None, append = False):
+        """
+        PURPOSE: Simulates playing the game by rolling all dice the specified number of times. Saves results of 
+        the play in a private DataFrame ("_play_results") in wide format.
+        
+        The whole rolls x dice matrix of outcomes is sampled at once: dice sharing identical weights are drawn together
+        and their face codes are written straight into a preallocated array, which _play_results wraps without copying.
+        
+        Rolls are split into fixed-size blocks, each with its own generator spawned from one root seed sequence. The blocks 
+        can be sampled by a pool of worker processes, and for a given seed the results are identical whatever the number of workers.
+        
+        INPUTS:
+            rolls (int): The number of times to roll the  dice.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            workers (None or int): The number of processes to sample with, or None for one per CPU. Defaults to 1.
+            store (None, str or os.PathLike): Where to keep the results: None for private memory, 'shared' for a shared memory 
+            block, or the path of a .npy file to memory-map (any other string is rejected). Games pickled to other processes attach to shared or 
+            memory-mapped results instead of copying them. Defaults to None.
+            sampling (str): How to draw the rolls. 'plain' draws them independently. 'importance' rolls the dice with the 
+            tilted proposal weights and keeps the likelihood ratio of every roll, so that the Analyzer returns weighted 
+            (unbiased) estimates; rare outcomes such as jackpots get sampled far more often. 'stratified' spreads the rolls 
+            of every die evenly over its distribution within each block, and 'antithetic' pairs every roll with a mirrored 
+            one; both keep every roll at weight one. Defaults to 'plain'.
+            proposal (array-like or List): The tilted weights for importance sampling: one array of weights in the order 
+            of the faces of the dice, or a list of one array per die. Defaults to None.
+            append (bool): Add the rolls after those of the most recent play instead of replacing them. Analyzers of the game 
+            then update their memoized statistics with the new rolls only. Appended results are kept in private memory. 
+            Defaults to False.
+        
+        RAISES:
+            ValueError: If the sampling mode, the proposal or the store is invalid, or if rolls are appended to a shared or 
+            memory-mapped play, or with importance sampling to a play without it (or the other way around).
+        
+        """
+        
+        #A misspelt 'shared' would otherwise create a file of that name
+        if isinstance(store, str) and store != 'shared' and not store.endswith('.npy'):
+            raise ValueError("store should be None, 'shared', or the path of a .npy file.")
+        
+        plan = self._sampling_plan(sampling, proposal)
+        root = _as_seed_sequence(rng)
+        importance = plan['log_ratios'] is not None
+        
+        if append and hasattr(self, '_play_results'):
+            if store is not None or self._store is not None:
+                raise ValueError("Appended rolls are kept in private memory. Please leave store as None and append to a play kept in private memory.")
+            if importance != (self._roll_weights is not None):
+                raise ValueError("Rolls can only be appended with importance sampling to a play that used it, and vice versa.")
+            
+            #Copy the previous rolls to the front of a larger array and sample the new rolls after them
+            previous = self._play_results.to_numpy()
+            appended_to = (self._version, len(previous))
+            outcomes = np.empty((len(previous) + rolls, len(self.list_of_dice)), dtype = self._code_dtype)
+            outcomes[:len(previous)] = previous
+            weights = np.concatenate([self._roll_weights, np.empty(rolls)]) if importance else None
+            del previous
+            self.release_results()
+        else:
+            appended_to = None
+            self.release_results()
+            outcomes = self._allocate_results(rolls, store)
+            weights = np.empty(rolls) if importance else None
+        
+        offset = len(outcomes) - rolls
+        blocks = [(offset + start, size) for start, size in _block_sizes(rolls)]
+        workers = min(_worker_count(workers), max(len(blocks), 1))
+        _count('rolls', rolls)
+        _count('result_bytes', outcomes.nbytes + (weights.nbytes if weights is not None else 0))
+        
+        with _phase('Game.play.sample'):
+            if workers == 1:
+                for block, (start, size) in enumerate(blocks):
+                    codes, block_weights = self._sample_block(size, np.random.default_rng(_block_seed(root, block)), plan, 
+                                                              out = outcomes[start:start + size])
+                    if weights is not None:
+                        weights[start:start + size] = block_weights
+            else:
+                tasks = [(size, _block_seed(root, block)) for block, (start, size) in enumerate(blocks)]
+                with ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (Game(self.list_of_dice), plan)) as pool:
+                    for (start, size), (codes, block_weights) in zip(blocks, pool.map(_play_block, tasks)):
+                        outcomes[start:start + size] = codes
+                        if weights is not None:
+                            weights[start:start + size] = block_weights
+            
+            if isinstance(outcomes, np.memmap):
+                outcomes.flush()
+        
+        # Save the results of the play to a private data frame in wide format by defualt
+        with _phase('Game.play.wrap'):
+            self._wrap_results(outcomes, appended_to)
+        self._roll_weights = weights
+        self._seed = root
+    
+    
+    def iter_play(self, rolls, chunk_size = 100000, rng = None, decode = False):
+        """
+        PURPOSE: Plays the game in fixed-size chunks of rolls, yielding each chunk instead of keeping the whole play.
+        Memory use depends on chunk_size only, so plays larger than memory can be fed to a StreamAnalyzer.
+        The results of the most recent play (_play_results) are left untouched. For a given seed the chunks put together 
+        are the same rolls as play would produce, whatever the chunk size.
+        
+        INPUTS:
+            rolls (int): The total number of times to roll the dice.
+            chunk_size (int): The number of rolls per chunk. Defaults to 100000.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            decode (bool): Yield wide data frames of face labels, indexed by roll number, instead of arrays of face codes. 
+            Defaults to False.
+            
+        OUTPUTS:
+            Generator: Yields a chunk_size x dice array of face codes per chunk (the last chunk may be shorter).
+            
+        RAISES:
+            ValueError: If chunk_size is not a positive integer.
+        """
+        
+        if chunk_size < 1:
+            raise ValueError("chunk_size should be a positive integer")
+        
+        root = _as_seed_sequence(rng)
+        blocks = self._iter_blocks((size, _block_seed(root, block)) for block, (start, size) in enumerate(_block_sizes(rolls)))
+        block, position = np.empty((0, len(self.list_of_dice)), dtype = self._code_dtype), 0
+        
+        for start in range(0, rolls, chunk_size):
+            
+            # Cut the chunk out of as many blocks as it spans
+            needed, parts = min(chunk_size, rolls - start), []
+            while needed > 0:
+                if position == len(block):
+                    block, position = next(blocks), 0
+                taken = min(needed, len(block) - position)
+                parts.append(block[position:position + taken])
+                position, needed = position + taken, needed - taken
+            codes = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            _count('rolls', len(codes))
+            
+            if decode:
+                yield pd.DataFrame(self._decode(codes), 
+                                   index = pd.RangeIndex(start + 1, start + len(codes) + 1, name = 'rolls'), 
+                                   columns = pd.RangeIndex(1, len(self.list_of_dice) + 1, name = 'die'))
+            else:
+                yield codes
+    
+    
+    def _view(self, form):
+        """
+        PURPOSE: Returns the data frame behind the views of the results in a given format, built on first use and kept 
+        until the game is played again or _play_results is replaced by another data frame.
+        
+        INPUTS:
+            form (str): 'wide' or 'narrow'.
+            
+        OUTPUTS:
+            pd.DataFrame: The data frame of face labels, wrapping a read-only array of decoded labels.
+        """
+        
+        #Views of a data frame assigned to _play_results directly are dropped
+        if self._views.get('results') is not self._play_results:
+            self._views = {'results': self._play_results}
+        
+        if form not in self._views:
+            if 'labels' not in self._views:
+                with _phase('Game.show_results.decode'):
+                    labels = self._decode(self._play_results.to_numpy())
+                    labels.flags.writeable = False
+                self._views['labels'] = labels
+            labels = self._views['labels']
+            
+            if form == 'wide':
+                self._views[form] = pd.DataFrame(labels, index = self._play_results.index, 
+                                                 columns = self._play_results.columns, copy = False)
+            else:
+                # The narrow format is the labels read row by row: roll numbers repeat once per die and die numbers 
+                # cycle once per roll, so the index is built from its levels without stacking the wide frame
+                with _phase('Game.show_results.narrow'):
+                    rolls, dice = labels.shape
+                    index = pd.MultiIndex(levels = [self._play_results.index, self._play_results.columns], 
+                                          codes = [np.repeat(np.arange(rolls), dice), np.tile(np.arange(dice), rolls)], 
+                                          names = ['rolls', 'die'], verify_integrity = False)
+                    self._views[form] = pd.DataFrame({'outcomes': labels.ravel()}, index = index, copy = False)
+        return self._views[form]
+    
+    
+    @_timed('Game.show_results')
+    def show_results(self, form = "wide", copy = False):
+        """
+        PURPOSE: Shows the user the results of the most recent play in either "wide" or "narrow" format.
+        
+        By default the data frame is a view: the face labels are decoded once per play and every view of the play shares 
+        them, without copying. The narrow form is the same labels raveled, with an index built from repeated roll and 
+        tiled die numbers, instead of a stacked copy of the wide form. Views never write through to the shared labels 
+        (pandas copies on write, or refuses to write into the read-only labels); pass copy = True to get an independent 
+        data frame up front. The labels are kept until the game is played again or _play_results is replaced, so editing 
+        _play_results in place is not seen by show_results; assign a new data frame instead.
+        
+        INPUTS: 
+            form (str): The format ("Wide" or "Narrow") to return the data frame in. Defaults to wide. 
+            copy (bool): Return an independent copy instead of a view. Defaults to False.
+        
+            
+        OUTPUTS:
+            pd.DataFrame: A DataFrame of the results of the most recent play in the requested format.
+            
+            
+        RAISES:
+            ValueError: If the user passes an invalid option for form other than "narrow" or "wide".
+            
+        """
+        
+        # Check if play_results has been initialized by checking for _play_results      
+        if not hasattr(self, '_play_results'): 
+            raise ValueError("The play method must be called before showing results.")
+            
+            #from https://stackoverflow.com/questions/610883/how-to-check-if-an-object-has-an-attribute
+        
+        if form not in ("wide", "narrow"):
+            raise ValueError("Invalid format. Please choose either 'wide' or 'narrow'.")
+        
+        #A shallow copy is a new data frame over the same data, so callers cannot rename or add columns of the shared one
+        return self._view(form).copy(deep = copy)
+                                                                    
+
+
+#-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+class Analyzer:
+    """
+    An Analyzer object takes the results of a single game and computes various descriptive statistical properties about it.
+    
+    ATTRIBUTES:
+        game(Game): A game object based on the given parameter.        
+ 
+    METHODS:
+        __init__ (self, game_object): Initializes the given game object.
+        
+        jackpot (self): Computes how many times the game resulted in a jackpot. Returns an integer for the number of jackpots.
+        
+        jackpot_rolls (self): Finds the rolls that resulted in a jackpot. Returns an index of roll numbers.
+        
+        jackpot_faces (self): Computes how many jackpots were rolled with each face. Returns a series of counts.
+        
+        face_count (self, sparse = False): Computes how many times a given face is rolled in each event. Returns a data frame of results.
+        
+        face_histogram (self): Computes how many times each face was rolled across all rolls. Returns a series of counts.
+        
+        combo_count (self): Computes the distinct combinations of faces rolled, along with their counts. Returns a data frame of results.
+        
+        permutation_count (self): Computes the distinct permutations of faces rolled, along with their counts. Returns a data frame of results.
+        
+        jackpot_interval (self, confidence = 0.95): Estimates the jackpot rate with a confidence interval. Returns a tuple.
+    
+    When the game was played with importance sampling, every roll counts with its likelihood ratio, so counts become 
+    weighted (unbiased) estimates of the counts of a plain play with as many rolls.
+    
+    Statistics are memoized against the version of the results of the game, so repeated calls are free until the game is 
+    played again. When rolls are appended (play with append = True), only the new rolls are counted and merged into the 
+    memoized statistics. Editing _play_results in place is not seen by the memoized statistics.
+    
+    """
+    
+    def __init__(self, game_object):
+        """
+        PURPOSE: Takes a game object as its input parameter and initializes it.
+        
+        INPUTS: 
+            game_object(Game): A game object.
+        
+        RAISES:
+            ValueError: If the passed value is not a Game object.
+        
+        """
+        if type(game_object) is not Game:
+            raise ValueError ("Passed object is not a game object")
+        
+        self.game = game_object
+        self._cache = {}        #Statistics keyed by name, as (version of the game results, value)
+        
+        
+    def _memoized(self, name, compute, combine):
+        """
+        PURPOSE: Returns a statistic memoized against the version of the game results. If the results only had rolls 
+        appended since the statistic was computed, the statistic of the new rolls is computed and merged into it.
+        
+        INPUTS:
+            name (str): The name of the statistic.
+            compute (callable): compute(start) returns the statistic of the rolls from row start on.
+            combine (callable): combine(old, new) merges the statistics of the earlier and of the appended rolls, or None 
+            to always recompute the statistic when the results change.
+            
+        OUTPUTS:
+            The statistic of all the rolls.
+        
+        RAISES:
+            ValueError: If the game has not been played yet.
+        """
+        
+        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
+            raise ValueError("The game has not been played yet. Please call the play method first.")
+        
+        version = self.game._version
+        if name in self._cache:
+            cached_version, value = self._cache[name]
+            if cached_version == version:
+                return value
+            start = self.game._appended_since(cached_version) if combine is not None else None
+            if start is not None:
+                value = combine(value, compute(start))
+                self._cache[name] = (version, value)
+                return value
+        
+        value = compute(0)
+        self._cache[name] = (version, value)
+        return value
+    
+    
+    def _rows(self, start):
+        """
+        PURPOSE: Returns the face codes and roll weights (None unless importance sampling) of the rolls from row start on.
+        """
+        
+        weights = self.game._roll_weights
+        return self.game._play_results.to_numpy()[start:], (weights[start:] if weights is not None else None)
+    
+    
+    def _distinct_rows(self, ordered):
+        """
+        PURPOSE: Returns the memoized distinct rows of face codes and their (weighted) counts.
+        
+        INPUTS:
+            ordered (bool): Count permutations if True, combinations otherwise.
+            
+        OUTPUTS:
+            Tuple: (rows, counts), see _count_rows.
+        """
+        
+        face_num = len(self.game._faces)
+        
+        def compute(start):
+            codes, weights = self._rows(start)
+            return _count_rows(codes, face_num, ordered = ordered, weights = weights)
+        
+        def combine(old, new):
+            #Rows of combinations are already sorted, so merging counts them as they are
+            return _count_rows(np.concatenate([old[0], new[0]]), face_num, weights = np.concatenate([old[1], new[1]]))
+        
+        return self._memoized('permutations' if ordered else 'combinations', compute, combine)
+        
+        
+    @_timed('Analyzer.jackpot')
+    def jackpot(self):
+        """
+        PURPOSE:
+            Computes how many times the game resulted in a jackpot. A jackpot is a result in which all faces are the same, e.g. all ones for a six-sided die.
+
+
+        OUTPUTS:
+            Int: An integer for the number of jackpots. After importance sampling, a float: the estimated number of 
+            jackpots in as many plain rolls.
+           
+            
+        """
+        
+        def compute(start):
+            codes, weights = self._rows(start)
+            mask = _jackpot_mask(codes)
+            return float(weights[mask].sum()) if weights is not None else int(mask.sum())
+        
+        return self._memoized('jackpot', compute, lambda old, new: old + new)
+    
+    
+    @_timed('Analyzer.jackpot_rolls')
+    def jackpot_rolls(self):
+        """
+        PURPOSE:
+            Finds the rolls that resulted in a jackpot.
+            
+        
+        OUTPUTS:
+            pd.Index: The roll numbers of the jackpots.
+        
+        """
         
-        OUTPUTS: 
-            List: A list of rolled faces (outcomes).
+        def compute(start):
+            return self.game._play_results.index[start:][_jackpot_mask(self._rows(start)[0])]
+        
+        return self._memoized('jackpot_rolls', compute, lambda old, new: old.append(new))
+    
+    
+    @_timed('Analyzer.jackpot_faces')
+    def jackpot_faces(self):
         """
+        PURPOSE:
+            Computes how many jackpots were rolled with each face, e.g. how many times all dice showed a six.
+            
         
-        results = []       #create list of results
+        OUTPUTS:
+            pd.Series: The number of jackpots per face (weighted after importance sampling), indexed by face values.
         
-        # Roll the die the specified number of times
+        """
         
-        for i in range(rolls):
-            result = self._my_die.faces.sample(weights = self._my_die.weights, replace = True).values[0]
-            results.append(result)
+        def compute(start):
+            codes, weights = self._rows(start)
+            mask = _jackpot_mask(codes)
+            return np.bincount(codes[mask, 0], weights = weights[mask] if weights is not None else None, 
+                               minlength = len(self.game._faces))
         
-        return results                           # what does he mean do not interanlly store the results, don't use self?
+        counts = self._memoized('jackpot_faces', compute, lambda old, new: old + new)
+        return pd.Series(counts.copy(), index = pd.Index(self.game._faces, name = "face values"), name = 'Count')
     
     
-    
-    def die_current_state(self):
+    def _face_counts(self):
         """
-        PURPOSE: Returns a copy of the private die data frame.
+        PURPOSE: Returns the memoized sparse face counts of every roll: only the (roll, face) pairs that show up are kept, 
+        so their number grows with the number of dice and not with the number of faces.
         
         OUTPUTS:
-            pd.DataFrame: A DataFrame of the die's faces and weights.
+            Tuple: (rolls, faces, counts) arrays, see _roll_face_counts. Counts are weighted after importance sampling.
         """
         
-        # Return a copy of the private die data frame
-        return self._my_die.copy()
-
- #-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
-
-
-class Game:
-    
-    """
-    Class representing a game consisting of rolling one or more similar dice (Die objects) one or more times. 
-    
-    Each game is initiated with a Python list of one or more dice. Similar dice mean that each die in a given game 
-    has the same number of sides and associated faces, but each die object may have its onw weights. Game objects have 
-    behavior to roll all the dice a given number of times. Game objects only keep the results of their most recent play.
-    
-    ATTRIBUTES:
-        list_of_dice(List): A list of one or more Dice objects that are used in the game. All dice must have the has the same number of sides and associated faces.
+        face_num = len(self.game._faces)
         
-        _play_results(pd.DataFrame): A private DataFrame that stores the results of the most recent play in "wide" format.
-    
-    METHODS:
-        __int__ (self, dice_list): Initializes a game with a list of Die objects.
+        def compute(start):
+            codes, weights = self._rows(start)
+            rolls, faces, counts = _roll_face_counts(codes, face_num, start)
+            if weights is not None:
+                counts = counts * weights[rolls - start]
+            return rolls, faces, counts
         
-        play(self,rolls): Rolls all the dice the specified number of times and saves the result of the play to a private data frame in "wide" format.
+        def combine(old, new):
+            return tuple(np.concatenate([old_part, new_part]) for old_part, new_part in zip(old, new))
         
-        show_results(self, form = 'wide'): Returns a copy of the private data frame of results of the most recent play in either "wide" or "narrow" format.
-
+        return self._memoized('face_counts', compute, combine)
     
-    """
     
-    def __init__(self, dice_list):
+    @_timed('Analyzer.face_count')
+    def face_count(self, sparse = False):
         """
-        PURPOSE: Takes a single parameter, a list of already instantiated similar dice and initializes a Game object with it.
+        PURPOSE:
+            Computes how many times a given face is rolled in each event. The counts are taken with one integer-coded 
+            bincount (or a sort, for dice with many faces) over all rolls, keeping only the faces each roll shows.
         
         INPUTS:
-            dice_list(List): A list of already instantiated similar dice objects.
-            
-        RAISES: 
-            TypeError: If any element in the dice_list is not a Die object.
-            ValueError: If any dice in the list have different faces.
-        """
-        
-        #Check that all elements in dice_list are of class Dice
-        for d in dice_list:
-            if (type(d) is not Dice):
-                raise TypeError ("All elements in the dice list must be objects of the Die Class")
+            sparse (bool): Return a pandas sparse data frame, where faces a roll does not show take no memory, instead of 
+            a dense one. Meant for dice with hundreds or thousands of faces; needs scipy. Defaults to False.
         
+        OUTPUTS: 
+          pd.DataFrame: A Data Frame of the face counts. The data frame has an index of the roll number, face values as columns, and count values in the cells.   
+          After importance sampling, the counts of each roll are multiplied by its likelihood ratio.
         
+        RAISES:
+            ImportError: If sparse is True and scipy is not installed.
         
-        faces = [(x.faces) for x in dice_list]      #get faces of all the die in the dice_list
+        """
        
-        # Check that all dice have the same faces
-        for die in dice_list[1:]:                    #start from the second die
-            if not np.array_equal(die.faces, dice_list[0].faces):             #comparing to the first die #*  
-                raise ValueError("All dice must have the same faces.")
-           
-        
-        #* from: https://stackoverflow.com/questions/10580676/comparing-two-numpy-arrays-for-equality-element-wise
-        
+        rolls, faces, counts = self._face_counts()
+        index = self.game._play_results.index
+        columns = pd.Index(self.game._faces, name = "face values")          #decode the face codes into labels
         
-        #Initialize the list of dice using the given parameter
-        self.list_of_dice = dice_list
+        if sparse:
+            try:
+                from scipy.sparse import csr_matrix
+            except ImportError:
+                raise ImportError("Sparse face counts need scipy. Please install it or use sparse = False.")
+            counts = counts.astype(np.result_type(counts, np.int64))          #the narrow memoized counts would overflow sums
+            matrix = csr_matrix((counts, (rolls, faces)), shape = (len(index), len(columns)))
+            return pd.DataFrame.sparse.from_spmatrix(matrix, index = index, columns = columns)
+        
+        dense = np.zeros((len(index), len(columns)))
+        dense[rolls, faces] = counts
+        return pd.DataFrame(dense, index = index, columns = columns)
     
     
-    def play(self,rolls):
+    @_timed('Analyzer.face_histogram')
+    def face_histogram(self):
         """
-        PURPOSE: Simulates playing the game by rolling all dice the specified number of times. Saves results of 
-        the play in a private DataFrame ("_play_results") in wide format.
+        PURPOSE:
+            Computes how many times each face was rolled, across all dice and all rolls, without building per-roll counts.
         
-        INPUTS:
-            rolls (int): The number of times to roll the  dice.
-            
+        OUTPUTS:
+            pd.Series: The number of times each face was rolled (weighted after importance sampling), indexed by face values.
         
         """
         
+        face_num = len(self.game._faces)
         
-        outcomes = {}
+        def compute(start):
+            codes, weights = self._rows(start)
+            if weights is not None:
+                weights = np.repeat(weights, codes.shape[1])          #every die of a roll counts with the weight of the roll
+            return np.bincount(codes.ravel(), weights = weights, minlength = face_num)
         
+        counts = self._memoized('face_histogram', compute, lambda old, new: old + new)
+        return pd.Series(counts.copy(), index = pd.Index(self.game._faces, name = "face values"), name = 'Count')
         
-        # Rolls each die and store the results
-        for i in range(len(self.list_of_dice)):
-            die = self.list_of_dice[i]
-            outcomes[i] = die.roll_the_die(rolls)
-
+   
+    @_timed('Analyzer.combo_count')
+    def combo_count(self): 
+        """
+        PURPOSE:
+            Computes the distinct combinations of faces rolled, along with their counts. Combinations are order-independent and may contain repetitions.
+            
         
-        # Save the results of the play to a private data frame in wide format by defualt
-        self._play_results = pd.DataFrame(outcomes)
+        OUTPUTS:
+            pd.DataFrame: A data frame of the count of order-independent combinations. 
+            
+        
+        """
+            
+            
+        #Sorting the codes of each roll sorts its faces, since the face table is sorted
+        rows, counts = self._distinct_rows(ordered = False)
         
-        self._play_results.index = [i+1 for i in range(len(self._play_results.index))]
+        frame = self._memoized('combo_count', lambda start: _counts_frame(rows, counts, self.game._faces), None)
+        return frame.copy()
+
+    @_timed('Analyzer.permutation_count')
+    def permutation_count(self):
+        """
+        PURPOSE:
+            Computes the distinct permutations of faces rolled, along with their counts. Permutations are order-dependent and may contain repetitions.
+
+
+        OUTPUTS:
+            pd.DataFrame: A data frame of counts of permutations.
         
-        self._play_results.columns = [i+1 for i in range(len(self._play_results.columns))]
+        """
         
-        self._play_results.index.name = 'rolls'
+        rows, counts = self._distinct_rows(ordered = True)
         
-        self._play_results.columns.name = 'die'
+        frame = self._memoized('permutation_count', lambda start: _counts_frame(rows, counts, self.game._faces), None)
+        return frame.copy()
     
     
-    def show_results(self, form = "wide"):
+    @_timed('Analyzer.jackpot_interval')
+    def jackpot_interval(self, confidence = 0.95):
         """
-        PURPOSE: Returns a copy of the private play data frame to show the user the results of the most recent play in either "wide" or "narrow" format.
+        PURPOSE:
+            Estimates the jackpot rate (jackpots per roll) with a confidence interval. Plain plays use a Wilson score 
+            interval, like StreamAnalyzer.jackpot_interval; importance-sampled plays use a normal interval on the weighted 
+            jackpot indicators, whose variance is what a good proposal reduces.
         
-        INPUTS: 
-            form (str): The format ("Wide" or "Narrow") to return the data frame in. Defaults to wide. 
+        INPUTS:
+            confidence (float): The confidence level. Defaults to 0.95.
         
-            
         OUTPUTS:
-            pd.DataFrame: A DataFrame of the results of the most recent play in the requested format.
-            
-            
-        RAISES:
-            ValueError: If the user passes an invalid option for form other than "narrow" or "wide".
-            
+            Tuple: (rate, half_width), the estimated jackpot rate and the half width of its interval.
+        
         """
         
-        # Check if play_results has been initialized by checking for _play_results      
-        if not hasattr(self, '_play_results'): 
-            raise Error("The play method must be called before showing results.")
-            
-            #from https://stackoverflow.com/questions/610883/how-to-check-if-an-object-has-an-attribute
+        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
+            raise ValueError("The game has not been played yet. Please call the play method first.")
         
+        rolls = len(self.game._play_results)
+        mask = _jackpot_mask(self.game._play_results.to_numpy())
+        if rolls == 0:
+            return 0.0, np.inf
+        
+        if self.game._roll_weights is None:
+            rate = mask.sum() / rolls
+            return float(rate), float(_wilson_half_width(rate, rolls, confidence))
+        
+        weighted = np.where(mask, self.game._roll_weights, 0.0)
+        rate = weighted.mean()
+        return float(rate), float(_interval_half_width(rate, weighted.var(), rolls, confidence))
         
-        if form == "wide":
-            return self._play_results.copy()                    #Return a copy of the private play data frame in wide format
-        elif form == "narrow": 
-            #Convert the data frame to narrow format
-            narrow_df = self._play_results.stack().reset_index().set_index(['rolls', 'die'])     
-            narrow_df.columns = ['outcomes']
-            return narrow_df.copy()                             #Returns a copy of the private play data frame in narrow format                  
-        else:
-            raise ValueError("Invalid format. Please choose either 'wide' or 'narrow'.")
-                                                                    
+
 
 
 #-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-class Analyzer:
+class StreamAnalyzer:
     """
-    An Analyzer object takes the results of a single game and computes various descriptive statistical properties about it.
+    A StreamAnalyzer builds the statistics of an Analyzer incrementally from chunks of rolls, so that games too large 
+    to hold in memory can be analyzed in constant memory. It keeps running jackpot totals, a histogram of the faces 
+    rolled and counters of the distinct combinations and permutations.
     
     ATTRIBUTES:
-        game(Game): A game object based on the given parameter.        
- 
+        game(Game): The game whose chunks of rolls are analyzed.
+        
+        rolls(int): The number of rolls analyzed so far.
+        
+        track_combos(bool): Whether combinations and permutations are counted. Their counters grow with the number of 
+        distinct rolls seen, so they can be turned off for very large dice.
+        
+        converged(bool): Whether the last run_until reached its tolerance. None before run_until is called.
+    
     METHODS:
-        __init__ (self, game_object): Initializes the given game object.
+        __init__ (self, game_object, track_combos = True): Initializes empty statistics for the given game object.
         
-        jackpot (self): Computes how many times the game resulted in a jackpot. Returns an integer for the number of jackpots.
+        update (self, codes): Adds a chunk of rolls (an array of face codes) to the statistics.
         
-        face_count (self): Computes how many times a given face is rolled in each event. Returns a data frame of results.
+        run (self, rolls, chunk_size = 100000, rng = None, workers = 1): Plays the game in chunks, optionally on a pool of 
+        worker processes, and adds every chunk to the statistics.
         
-        combo_count (self): Computes the distinct combinations of faces rolled, along with their counts. Returns a data frame of results.
+        run_until (self, tolerance, stats = ('jackpot', 'faces'), confidence = 0.95, batch_size = 10000, max_rolls = 10**8, 
+        rng = None, relative = False): Plays the game in batches until the confidence intervals of the requested statistics are narrow enough.
         
-        permutation_count (self): Computes the distinct permutations of faces rolled, along with their counts. Returns a data frame of results.
+        merge (self, other): Adds the statistics of another StreamAnalyzer of the same game.
+        
+        jackpot (self): Returns the number of jackpots so far.
+        
+        jackpot_faces (self): Returns the number of jackpots per face so far.
+        
+        face_histogram (self): Returns how many times each face was rolled across all rolls so far.
+        
+        combo_count (self): Returns the counts of the distinct combinations so far.
+        
+        permutation_count (self): Returns the counts of the distinct permutations so far.
+        
+        jackpot_interval (self, confidence = 0.95): Returns the estimated jackpot rate and the half width of its confidence interval.
+        
+        face_intervals (self, confidence = 0.95): Returns the estimated frequency of each face and the half widths of their confidence intervals.
     
     """
     
-    def __init__(self, game_object):
+    def __init__(self, game_object, track_combos = True):
         """
-        PURPOSE: Takes a game object as its input parameter and initializes it.
+        PURPOSE: Takes a game object and initializes empty running statistics for it.
         
         INPUTS: 
             game_object(Game): A game object.
+            track_combos(bool): Count combinations and permutations. Defaults to True.
         
         RAISES:
             ValueError: If the passed value is not a Game object.
@@ -290,112 +2010,289 @@ class Analyzer:
             raise ValueError ("Passed object is not a game object")
         
         self.game = game_object
+        self.track_combos = track_combos
+        self.rolls = 0
+        self.converged = None
         
+        face_num = len(game_object._faces)
+        self._jackpot_faces = np.zeros(face_num, dtype = np.int64)
+        self._face_totals = np.zeros(face_num, dtype = np.int64)
+        self._face_squares = np.zeros(face_num, dtype = np.int64)        #sum over rolls of the squared count of each face, for variances
         
-    def jackpot(self):
+        #Distinct rows of codes seen so far and how many times each one occurred
+        empty_rows = np.empty((0, len(game_object.list_of_dice)), dtype = game_object._code_dtype)
+        self._combos = (empty_rows, np.zeros(0, dtype = np.int64))
+        self._perms = (empty_rows, np.zeros(0, dtype = np.int64))
+        
+        
+    def _add_rows(self, counter, rows, counts):
         """
-        PURPOSE:
-            Computes how many times the game resulted in a jackpot. A jackpot is a result in which all faces are the same, e.g. all ones for a six-sided die.
-
-
+        PURPOSE: Merges distinct rows and their counts into one of the running counters.
+        
+        INPUTS:
+            counter (Tuple): The (rows, counts) counter to merge into.
+            rows (np.ndarray): Distinct rows of face codes.
+            counts (np.ndarray): How many times each row occurred.
+            
         OUTPUTS:
-            Int: An integer for the number of jackpots.
-           
+            Tuple: The merged (rows, counts) counter.
+        """
+        
+        return _count_rows(np.concatenate([counter[0], rows]), len(self.game._faces), 
+                           weights = np.concatenate([counter[1], counts.astype(np.int64)]))
+    
+    
+    @_timed('StreamAnalyzer.update')
+    def update(self, codes):
+        """
+        PURPOSE: Adds a chunk of rolls to the running statistics.
+        
+        INPUTS:
+            codes (np.ndarray): A rolls x dice array of face codes, as yielded by Game.iter_play.
             
+        OUTPUTS:
+            StreamAnalyzer: The analyzer itself, so that calls can be chained.
         """
         
-        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
-            raise ValueError("The game has not been played yet. Please call the play method first.")
-
+        face_num = len(self.game._faces)
         
+        jackpot_codes = codes[_jackpot_mask(codes), 0]
+        self._jackpot_faces += np.bincount(jackpot_codes, minlength = face_num)
+        self._face_totals += np.bincount(codes.ravel(), minlength = face_num)
         
-        jackpot = 0 
+        rolls, faces, counts = _roll_face_counts(codes, face_num)
+        self._face_squares += np.bincount(faces, weights = np.square(counts, dtype = float), minlength = face_num).astype(np.int64)
         
-        # Iterate through each roll and check if the faces are all the same, indicating a jackpot       
-        for index, row in self.game._play_results.iterrows():                       #* 
-            if (len(np.unique(row.values)) == 1):      
-                jackpot +=1
+        if self.track_combos:
+            self._perms = self._add_rows(self._perms, *_count_rows(codes, face_num, ordered = True))
+            self._combos = self._add_rows(self._combos, *_count_rows(codes, face_num, ordered = False))
         
-        return jackpot       
+        self.rolls += len(codes)
+        return self
     
-    #* from https://stackoverflow.com/questions/16476924/how-can-i-iterate-over-rows-in-a-pandas-dataframe
     
-    def face_count(self):
+    def run(self, rolls, chunk_size = 100000, rng = None, workers = 1):
         """
-        PURPOSE:
-            Computes how many times a given face is rolled in each event. 
+        PURPOSE: Plays the game in chunks with Game.iter_play and adds every chunk to the running statistics.
         
+        With more than one worker, the blocks of rolls are shared out to a process pool, each process builds the statistics 
+        of its blocks and the partial statistics are merged. For a given seed the statistics are the same whatever the number of workers.
         
-        OUTPUTS: 
-          pd.DataFrame: A Data Frame of the face counts. The data frame has an index of the roll number, face values as columns, and count values in the cells.   
-        
+        INPUTS:
+            rolls (int): The number of times to roll the dice.
+            chunk_size (int): The number of rolls per chunk. Defaults to 100000.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            workers (None or int): The number of processes to sample with, or None for one per CPU. Defaults to 1.
+            
+        OUTPUTS:
+            StreamAnalyzer: The analyzer itself, so that calls can be chained.
         """
-       
-    
-        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
-            raise ValueError("The game has not been played yet. Please call the play method first.")
-
-        
-        counts = self.game._play_results.stack().groupby('rolls').value_counts().unstack()
-        counts = counts.fillna(0)
-        counts.columns.name = "face values"
-        face_num = len(self.game.list_of_dice[0].faces)            #since game objects require all dice have the same number of faces                                             
-        counts = counts.reindex(columns = range(1,int(face_num)+1), fill_value = 0.0)
-        return counts
         
-   
-    def combo_count(self): 
+        workers = _worker_count(workers)
+        if workers == 1:
+            for codes in self.game.iter_play(rolls, chunk_size, rng):
+                self.update(codes)
+            return self
+        
+        # Deal contiguous runs of blocks to the workers, a few runs per worker to balance the load
+        root = _as_seed_sequence(rng)
+        blocks = [(size, _block_seed(root, block)) for block, (start, size) in enumerate(_block_sizes(rolls))]
+        runs = np.array_split(np.arange(len(blocks)), min(4 * workers, max(len(blocks), 1)))
+        tasks = [([blocks[i] for i in run], self.track_combos) for run in runs if len(run)]
+        
+        with ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (Game(self.game.list_of_dice),)) as pool:
+            for partial in pool.map(_analyze_blocks, tasks):
+                partial.game = self.game
+                self.merge(partial)
+        return self
+    
+    
+    def run_until(self, tolerance, stats = ('jackpot', 'faces'), confidence = 0.95, batch_size = 10000, 
+                  max_rolls = 10**8, rng = None, relative = False):
         """
-        PURPOSE:
-            Computes the distinct combinations of faces rolled, along with their counts. Combinations are order-independent and may contain repetitions.
-            
+        PURPOSE: Plays the game in batches, updating the statistics after each batch, and stops as soon as the confidence 
+        interval of every requested statistic is narrower than the tolerance, so that no more rolls are spent than the 
+        reported precision needs. Batches are drawn like the chunks of Game.iter_play, so a seed reproduces the run.
         
+        INPUTS:
+            tolerance (float): The largest accepted half width of the confidence intervals.
+            stats (iterable): The statistics to control: 'jackpot' for the jackpot rate and 'faces' for the frequency of 
+            every face. Defaults to both.
+            confidence (float): The confidence level of the intervals. Defaults to 0.95.
+            batch_size (int): The number of rolls between two checks of the intervals. Defaults to 10000.
+            max_rolls (int): The largest total number of rolls to play, converged or not. Defaults to 10**8.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            relative (bool): Compare the half widths with tolerance times the estimates instead of with the tolerance itself. 
+            Defaults to False.
+            
         OUTPUTS:
-            pd.DataFrame: A data frame of the count of order-independent combinations. 
+            StreamAnalyzer: The analyzer itself, with converged set to whether the tolerance was reached.
             
+        RAISES:
+            ValueError: If a statistic other than 'jackpot' or 'faces' is requested.
+        """
         
+        stats = list(stats)
+        for stat in stats:
+            if stat not in ('jackpot', 'faces'):
+                raise ValueError("Invalid statistic. Please choose 'jackpot' and/or 'faces'.")
+        
+        def narrow_enough(estimate, half_width):
+            limit = tolerance * np.abs(estimate) if relative else tolerance
+            return bool(np.all(half_width <= limit))
+        
+        self.converged = False
+        for codes in self.game.iter_play(max_rolls, batch_size, rng):
+            self.update(codes)
+            
+            self.converged = True
+            if 'jackpot' in stats:
+                self.converged = narrow_enough(*self.jackpot_interval(confidence))
+            if 'faces' in stats and self.converged:
+                intervals = self.face_intervals(confidence)
+                self.converged = narrow_enough(intervals['frequency'].to_numpy(), intervals['half_width'].to_numpy())
+            if self.converged:
+                break
+        return self
+    
+    
+    def merge(self, other):
         """
+        PURPOSE: Adds the running statistics of another StreamAnalyzer, e.g. one that analyzed other chunks of the same game.
+        
+        INPUTS:
+            other (StreamAnalyzer): An analyzer of a game with the same faces and number of dice.
             
+        OUTPUTS:
+            StreamAnalyzer: The analyzer itself, so that calls can be chained.
             
-        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
-            raise ValueError("The game has not been played yet. Please call the play method first.")
-
+        RAISES:
+            ValueError: If the two analyzers do not describe the same kind of game.
+        """
         
+        if (not np.array_equal(self.game._faces, other.game._faces) 
+            or len(self.game.list_of_dice) != len(other.game.list_of_dice)):
+            raise ValueError("Only analyzers of games with the same faces and number of dice can be merged.")
+        
+        self._jackpot_faces += other._jackpot_faces
+        self._face_totals += other._face_totals
+        self._face_squares += other._face_squares
+        self.track_combos = self.track_combos and other.track_combos
+        if self.track_combos:
+            self._perms = self._add_rows(self._perms, *other._perms)
+            self._combos = self._add_rows(self._combos, *other._combos)
+        self.rolls += other.rolls
+        return self
+    
+    
+    def jackpot(self):
+        """
+        PURPOSE: Returns how many of the rolls analyzed so far were jackpots.
         
-        combos = [*self.game._play_results.itertuples(index = False, name = None)]   #*
-        combos = [tuple(sorted(i)) for i in combos]                                            #turning all combos into tuples 
-        combo_df = pd.DataFrame(combos)
-        combo_df.columns = combo_df.columns +1
-        combo_df = combo_df.groupby(combo_df.columns.tolist(), as_index = False).size()
-        combo_df.rename(columns={'size': 'Count'}, inplace=True)
-        combo_df = combo_df.set_index(combo_df.columns[:-1].tolist())
+        OUTPUTS:
+            Int: An integer for the number of jackpots.
+        """
         
+        return int(self._jackpot_faces.sum())
+    
+    
+    def jackpot_faces(self):
+        """
+        PURPOSE: Returns how many jackpots were rolled with each face so far.
         
-        return combo_df
-
-      #* from https://stackoverflow.com/questions/55976283/how-to-get-data-from-rows-into-tuples
-
+        OUTPUTS:
+            pd.Series: The number of jackpots per face, indexed by face values.
+        """
+        
+        return pd.Series(self._jackpot_faces.copy(), index = pd.Index(self.game._faces, name = "face values"), name = 'Count')
+    
+    
+    def face_histogram(self):
+        """
+        PURPOSE: Returns how many times each face was rolled, across all dice and all rolls analyzed so far.
+        
+        OUTPUTS:
+            pd.Series: The number of times each face was rolled, indexed by face values.
+        """
+        
+        return pd.Series(self._face_totals.copy(), index = pd.Index(self.game._faces, name = "face values"), name = 'Count')
+    
+    
+    def combo_count(self):
+        """
+        PURPOSE: Returns the distinct combinations of faces rolled so far, along with their counts.
+        
+        OUTPUTS:
+            pd.DataFrame: A data frame of the count of order-independent combinations, as returned by Analyzer.combo_count.
+            
+        RAISES:
+            ValueError: If the analyzer does not track combinations.
+        """
+        
+        if not self.track_combos:
+            raise ValueError("Combinations are not tracked. Create the analyzer with track_combos = True.")
+        return _counts_frame(*self._combos, self.game._faces)
+    
+    
     def permutation_count(self):
         """
-        PURPOSE:
-            Computes the distinct permutations of faces rolled, along with their counts. Permutations are order-dependent and may contain repetitions.
-
-
+        PURPOSE: Returns the distinct permutations of faces rolled so far, along with their counts.
+        
         OUTPUTS:
-            pd.DataFrame: A data frame of counts of permutations.
+            pd.DataFrame: A data frame of counts of permutations, as returned by Analyzer.permutation_count.
+            
+        RAISES:
+            ValueError: If the analyzer does not track permutations.
+        """
+        
+        if not self.track_combos:
+            raise ValueError("Permutations are not tracked. Create the analyzer with track_combos = True.")
+        return _counts_frame(*self._perms, self.game._faces)
+    
+    
+    def jackpot_interval(self, confidence = 0.95):
+        """
+        PURPOSE: Estimates the jackpot rate (jackpots per roll) with a Wilson score confidence interval, which stays 
+        meaningful when no jackpot has been seen yet.
         
+        INPUTS:
+            confidence (float): The confidence level. Defaults to 0.95.
+            
+        OUTPUTS:
+            Tuple: (rate, half_width). The interval is the Wilson center plus or minus half_width, and the rate is the 
+            plain fraction of jackpots.
         """
         
-        if not hasattr(self.game, '_play_results') or self.game._play_results is None:
-            raise ValueError("The game has not been played yet. Please call the play method first.")
-
+        if self.rolls == 0:
+            return 0.0, np.inf
         
-        perm_tuples = [*self.game._play_results.itertuples(index=False, name=None)]                    #turning combos into tuples 
-        perm_counts_df = pd.DataFrame(perm_tuples)
-        perm_counts_df.columns = perm_counts_df.columns +1
-        perm_counts_df = perm_counts_df.groupby(perm_counts_df.columns.tolist(), as_index = False).size()
-        perm_counts_df.rename(columns={'size': 'Count'}, inplace=True)
-        perm_counts_df = perm_counts_df.set_index(perm_counts_df.columns[:-1].tolist())
+        rate = self.jackpot() / self.rolls
+        return rate, float(_wilson_half_width(rate, self.rolls, confidence))
+    
+    
+    def face_intervals(self, confidence = 0.95):
+        """
+        PURPOSE: Estimates the frequency of each face (its share of all dice rolled) with a normal confidence interval. 
+        The variance is taken over rolls, since the dice of one roll are counted together. The half width is never 
+        narrower than the Wilson score interval of the share over all dice rolled, so a face that has not shown up yet 
+        (or always shows up) is not reported as known exactly.
         
-        return perm_counts_df
+        INPUTS:
+            confidence (float): The confidence level. Defaults to 0.95.
+            
+        OUTPUTS:
+            pd.DataFrame: A data frame indexed by face values with 'frequency' and 'half_width' columns.
+        """
         
+        dice_num = len(self.game.list_of_dice)
+        rolls = max(self.rolls, 1)
+        mean = self._face_totals / rolls                                 #dice showing the face per roll
+        variance = self._face_squares / rolls - mean ** 2
+        half_width = _interval_half_width(mean, variance * rolls / max(rolls - 1, 1), self.rolls, confidence)
+        if self.rolls:
+            #In units of dice per roll, like the normal half width
+            wilson = _wilson_half_width(mean / dice_num, self.rolls * dice_num, confidence) * dice_num
+            half_width = np.maximum(half_width, wilson)
+        
+        return pd.DataFrame({'frequency': mean / dice_num, 'half_width': half_width / dice_num}, 
+                            index = pd.Index(self.game._faces, name = "face values"))
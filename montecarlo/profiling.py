@@ -0,0 +1,183 @@
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+
+
+#The profile collecting measurements in the current context (thread or asyncio task), None when profiling is off
+_active = ContextVar('montecarlo_profile', default = None)
+
+#Shared do-nothing context returned by _phase when profiling is off
+_NULL_PHASE = nullcontext()
+
+
+def _phase(name):
+    """
+    PURPOSE: Times a phase of a simulation, e.g. with _phase('Game.play.sample'): ... Does nothing unless a Profile is active.
+
+    INPUTS:
+        name (str): The name of the phase.
+
+    OUTPUTS:
+        Context manager: Records the wall time of its block in the active profile.
+    """
+
+    profile = _active.get()
+    return _NULL_PHASE if profile is None else profile._time(name)
+
+
+def _count(name, value = 1):
+    """
+    PURPOSE: Adds to a counter of the active profile, such as 'rolls' or 'cache_hits'. Does nothing unless a Profile is active.
+
+    INPUTS:
+        name (str): The name of the counter.
+        value (int): The amount to add. Defaults to 1.
+    """
+
+    profile = _active.get()
+    if profile is not None:
+        profile._add(name, value)
+
+
+def _timed(name):
+    """
+    PURPOSE: Decorates a method so that every call is timed as a phase of the active profile.
+
+    INPUTS:
+        name (str): The name of the phase.
+
+    OUTPUTS:
+        Callable: The decorator.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            profile = _active.get()
+            if profile is None:
+                return method(*args, **kwargs)
+            with profile._time(name):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Profile:
+    """
+    A Profile records where the time of a simulation goes while it is active: the wall time and number of calls of each
+    phase of Dice, Game and Analyzer (sampling, wrapping results, decoding, reshaping, counting), the number of rolls
+    sampled, the bytes allocated for results, and hits and misses of the cached sampling tables of the dice.
+    Profiling is off unless a Profile is active, and then costs one check per instrumented call.
+
+    ATTRIBUTES:
+        phases (dict): The number of calls and total seconds of each phase, keyed by phase name.
+
+        counters (dict): The counters ('rolls', 'result_bytes', 'cache_hits', 'cache_misses'), keyed by name.
+
+        callback (callable): Called as callback(kind, name, value) on every measurement, with kind 'phase' (value in
+        seconds) or 'count'. May be None.
+
+    METHODS:
+        __init__ (self, callback = None): Initializes an empty profile.
+
+        __enter__ (self): Activates the profile in the current thread or asyncio task; profiles can be nested.
+
+        __exit__ (self, *exc_info): Deactivates the profile and restores the one it replaced. Raises RuntimeError if a
+        profile entered after it is still active.
+
+        report (self): Returns the phases as a data frame sorted by total time.
+
+        reset (self): Clears all measurements.
+
+    Rolls sampled by worker processes of a parallel play are counted, but the time spent inside the workers is only seen
+    as part of the sampling phase of the parent process. The active profile is kept in a context variable, so concurrent
+    asyncio tasks each see their own profile, and executor threads see none.
+
+    """
+
+    def __init__(self, callback = None):
+        """
+        PURPOSE: Initializes an empty profile.
+
+        INPUTS:
+            callback (callable): A hook called as callback(kind, name, value) on every measurement. Defaults to None.
+        """
+
+        self.callback = callback
+        self.phases = {}
+        self.counters = {}
+        self._tokens = []
+
+
+    def __enter__(self):
+        self._tokens.append(_active.set(self))
+        return self
+
+
+    def __exit__(self, *exc_info):
+        #Restoring the profile this one replaced would deactivate a profile entered later, or reactivate a finished one
+        if _active.get() is not self:
+            raise RuntimeError("Profiles must exit in the reverse order they were entered.")
+        _active.reset(self._tokens.pop())
+        return False
+
+
+    @contextmanager
+    def _time(self, name):
+        """
+        PURPOSE: Times a block of code as one call of a phase.
+
+        INPUTS:
+            name (str): The name of the phase.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            calls, seconds = self.phases.get(name, (0, 0.0))
+            self.phases[name] = (calls + 1, seconds + elapsed)
+            if self.callback is not None:
+                self.callback('phase', name, elapsed)
+
+
+    def _add(self, name, value):
+        """
+        PURPOSE: Adds to a counter.
+
+        INPUTS:
+            name (str): The name of the counter.
+            value (int): The amount to add.
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None:
+            self.callback('count', name, value)
+
+
+    def report(self):
+        """
+        PURPOSE: Summarizes the phases recorded so far.
+
+        OUTPUTS:
+            pd.DataFrame: A data frame indexed by phase name, with 'calls', 'seconds' (in total) and 'per_call' columns, sorted
+            by decreasing time. Phases nested in another one, such as 'Game.play.sample' in 'Game.play', are part of its time.
+        """
+
+        report = pd.DataFrame.from_dict(self.phases, orient = 'index', columns = ['calls', 'seconds'])
+        report.index.name = 'phase'
+        report['per_call'] = report['seconds'] / report['calls']
+        return report.sort_values('seconds', ascending = False)
+
+
+    def reset(self):
+        """
+        PURPOSE: Clears all measurements.
+        """
+
+        self.phases.clear()
+        self.counters.clear()
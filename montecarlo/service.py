@@ -0,0 +1,239 @@
+import asyncio
+import weakref
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from .montecarlo import (Dice, Game, Analyzer, StreamAnalyzer, _BLOCK_ROLLS, _analyze_blocks, _as_seed_sequence,
+                         _block_seed, _block_sizes)
+
+
+def _sample_chunk(game, blocks):
+    """
+    PURPOSE: Samples a chunk of consecutive blocks of rolls with Game._iter_blocks, in an executor thread or process.
+    """
+
+    return np.concatenate(list(game._iter_blocks(blocks)))
+
+
+class SimulationService:
+    """
+    A SimulationService runs plays and analyses from asyncio code, such as a web service, without blocking the event
+    loop. Sampling runs in an executor one chunk of rolls at a time: progress is reported (or partial statistics are
+    yielded) after every chunk, and cancelling the awaiting task stops the simulation at the next chunk. Dice are
+    prepared once per set of faces and weights, with their sampling tables built, and shared by all requests.
+
+    For a given seed a play returns the same rolls as Game.play, whatever the executor and the chunk size.
+
+    ATTRIBUTES:
+        executor (concurrent.futures.Executor): Where chunks are sampled. None for the default executor of the loop.
+
+        chunk_size (int): The number of rolls sampled per executor call, rounded up to whole blocks of rolls.
+
+        max_prepared (int): The number of sets of prepared dice kept; the least recently used ones are dropped first.
+
+    METHODS:
+        __init__ (self, executor = None, chunk_size = 2**18, max_prepared = 128): Initializes an empty pool of dice.
+
+        game (self, faces, weights = None, dice_num = 1): Returns a new Game over prepared dice from the pool.
+
+        play (self, game, rolls, rng = None, progress = None): Coroutine that plays a new game over the dice of a game
+        and returns it.
+
+        stream (self, game, rolls, rng = None, track_combos = True): Asynchronous generator that yields the running
+        statistics of a play after every chunk.
+
+        analyze (self, game, statistic = 'face_count', *args, **kwargs): Coroutine that computes an Analyzer statistic
+        of a played game in the executor.
+
+    """
+
+    def __init__(self, executor = None, chunk_size = 2**18, max_prepared = 128):
+        """
+        PURPOSE: Initializes the service with an executor and an empty pool of prepared dice.
+
+        INPUTS:
+            executor (concurrent.futures.Executor): A thread or process pool to sample in. Defaults to None for the
+            default executor of the event loop (a thread pool; NumPy releases the GIL while sampling).
+            chunk_size (int): The number of rolls per chunk. Defaults to 2**18.
+            max_prepared (int): The number of sets of prepared dice to keep. Defaults to 128.
+
+        RAISES:
+            ValueError: If chunk_size is not a positive integer.
+        """
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size should be a positive integer.")
+
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.max_prepared = max_prepared
+        self._prepared = OrderedDict()          #Lists of prepared dice keyed by faces, weights and number of dice
+        # Memoized Analyzer statistics of every played game still alive. The memo holds no reference to its game, so
+        # entries go away with their game
+        self._memos = weakref.WeakKeyDictionary()
+
+
+    def game(self, faces, weights = None, dice_num = 1):
+        """
+        PURPOSE: Returns a new Game over dice taken from the pool of prepared dice, preparing them on first use. The
+        dice are shared with every other game of the same faces and weights, so they should not be changed.
+
+        INPUTS:
+            faces (np.ndarray): The faces of the dice.
+            weights (array-like): The weights of the faces, for every die or as one row per die. Defaults to None for fair dice.
+            dice_num (int): The number of dice. Defaults to 1.
+
+        OUTPUTS:
+            Game: A game without results.
+
+        RAISES:
+            ValueError: If the weights do not have one weight per face, or are negative or sum to zero.
+        """
+
+        faces = np.asarray(faces)
+        weights = np.ones(len(faces)) if weights is None else np.asarray(weights, dtype = float)
+        weights = np.broadcast_to(weights, (dice_num, len(faces)))
+        key = (tuple(faces.tolist()), faces.dtype.str, weights.tobytes())
+
+        if key in self._prepared:
+            self._prepared.move_to_end(key)
+        else:
+            dice = []
+            for die_weights in weights:
+                die = Dice(faces)
+                die.set_weights(die_weights)
+                self._prepare(die)
+                dice.append(die)
+            self._prepared[key] = dice
+            if len(self._prepared) > self.max_prepared:
+                self._prepared.popitem(last = False)
+        return Game(self._prepared[key])
+
+
+    @staticmethod
+    def _prepare(die):
+        """
+        PURPOSE: Builds the cached sampling tables of a die, so that concurrent requests only ever read them.
+
+        INPUTS:
+            die (Dice): The die to prepare.
+        """
+
+        die._cdf()
+        if len(die.faces) >= die._ALIAS_MIN_FACES:
+            die._alias_table()
+
+
+    def _chunks(self, rolls, root):
+        """
+        PURPOSE: Groups the seeded blocks of a play into chunks of about chunk_size rolls.
+
+        INPUTS:
+            rolls (int): The number of rolls.
+            root (np.random.SeedSequence): The root seed sequence of the play.
+
+        OUTPUTS:
+            List: One (start, blocks) pair per chunk, where blocks are (size, seed) pairs.
+        """
+
+        per_chunk = max(1, -(-self.chunk_size // _BLOCK_ROLLS))
+        blocks = [(start, size, _block_seed(root, block)) for block, (start, size) in enumerate(_block_sizes(rolls))]
+        return [(blocks[i][0], [(size, seed) for start, size, seed in blocks[i:i + per_chunk]])
+                for i in range(0, len(blocks), per_chunk)]
+
+
+    def _request_game(self, game):
+        """
+        PURPOSE: Returns a game of its own for a request, over the same dice as the given game, whose tables are
+        prepared once.
+        """
+
+        for die in game.list_of_dice:
+            self._prepare(die)
+        return Game(game.list_of_dice)
+
+
+    async def play(self, game, rolls, rng = None, progress = None):
+        """
+        PURPOSE: Plays a new game over the dice of a game without blocking the event loop. The given game is left
+        untouched, so concurrent requests can share it.
+
+        INPUTS:
+            game (Game): The game whose dice to roll, e.g. from the game method.
+            rolls (int): The number of times to roll the dice.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            progress (callable): Called as progress(done, rolls) after every chunk. Defaults to None.
+
+        OUTPUTS:
+            Game: A new game holding the results of the play, as Game.play would leave them.
+
+        RAISES:
+            asyncio.CancelledError: If the task is cancelled; sampling stops after the chunk in progress.
+        """
+
+        loop = asyncio.get_running_loop()
+        played = self._request_game(game)
+        root = _as_seed_sequence(rng)
+        outcomes = played._allocate_results(rolls, None)
+
+        for start, blocks in self._chunks(rolls, root):
+            codes = await loop.run_in_executor(self.executor, _sample_chunk, played, blocks)
+            outcomes[start:start + len(codes)] = codes
+            if progress is not None:
+                progress(start + len(codes), rolls)
+
+        played._wrap_results(outcomes)
+        played._seed = root
+        return played
+
+
+    async def stream(self, game, rolls, rng = None, track_combos = True):
+        """
+        PURPOSE: Plays the dice of a game chunk by chunk without keeping the rolls, and yields the running statistics
+        after every chunk, e.g. to send partial results to a client.
+
+        INPUTS:
+            game (Game): The game whose dice to roll.
+            rolls (int): The number of times to roll the dice.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            track_combos (bool): Whether to count combinations and permutations. Defaults to True.
+
+        OUTPUTS:
+            Asynchronous generator: Yields the same StreamAnalyzer after every chunk, updated with the rolls so far.
+        """
+
+        loop = asyncio.get_running_loop()
+        request_game = self._request_game(game)
+        analyzer = StreamAnalyzer(request_game, track_combos)
+
+        for start, blocks in self._chunks(rolls, _as_seed_sequence(rng)):
+            chunk = await loop.run_in_executor(self.executor, _analyze_blocks, (blocks, track_combos), request_game)
+            chunk.game = request_game
+            analyzer.merge(chunk)
+            yield analyzer
+
+
+    async def analyze(self, game, statistic = 'face_count', *args, **kwargs):
+        """
+        PURPOSE: Computes a statistic of a played game with an Analyzer in the executor, without blocking the event loop.
+        Statistics are memoized per game, as by Analyzer, so repeated requests for a game are answered from the memo
+        until it is played again. In a process executor the statistics are computed in the worker and not memoized.
+
+        INPUTS:
+            game (Game): A played game, e.g. returned by play.
+            statistic (str): The name of the Analyzer method, e.g. 'jackpot' or 'combo_count'. Defaults to 'face_count'.
+            *args, **kwargs: The arguments of the method.
+
+        OUTPUTS:
+            The result of the Analyzer method.
+
+        RAISES:
+            AttributeError: If statistic is not a method of Analyzer.
+        """
+
+        analyzer = Analyzer(game)
+        analyzer._cache = self._memos.setdefault(game, analyzer._cache)
+        method = getattr(analyzer, statistic)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(method, *args, **kwargs))
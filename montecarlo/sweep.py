@@ -0,0 +1,277 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+from .montecarlo import (Dice, Game, _as_seed_sequence, _block_seed, _block_sizes, _interval_half_width, _jackpot_mask,
+                         _roll_face_counts, _worker_count)
+
+
+def _sweep_blocks(task):
+    """
+    PURPOSE: Samples blocks of rolls for every scenario of a sweep, in a worker process or in the calling one.
+
+    INPUTS:
+        task (Tuple): (sweep, blocks, baseline), the Sweep, a list of (size, seed) blocks and the position of the baseline
+        scenario (or None).
+
+    OUTPUTS:
+        dict: The sums of the per-roll values of every scenario, see Sweep._add_block.
+    """
+
+    sweep, blocks, baseline = task
+    totals = sweep._empty_totals()
+    for size, seed in blocks:
+        sweep._add_block(totals, size, np.random.default_rng(seed), baseline)
+    return totals
+
+
+class Sweep:
+    """
+    A Sweep plays many weightings (scenarios) of the same dice at once, such as a fair and an unfair coin, and returns
+    the statistics of every scenario in one tidy table. All scenarios are rolled from the same uniform random numbers
+    (common random numbers): a roll of one scenario only differs from the same roll of another where their weights
+    differ, so differences between scenarios are estimated with far less noise than from independent plays.
+
+    ATTRIBUTES:
+        faces (np.ndarray): The faces shared by every die of every scenario.
+
+        weights (np.ndarray): A scenarios x dice x faces array of weights.
+
+        names (pd.Index): The names of the scenarios.
+
+        games (List): One Game per scenario, with its weighted dice.
+
+    METHODS:
+        __init__ (self, faces, weights, dice_num = 1, names = None): Builds the dice of every scenario.
+
+        run (self, rolls, rng = None, workers = 1, baseline = None, confidence = 0.95): Plays every scenario and returns
+        a tidy data frame of statistics, with confidence intervals and, against a baseline scenario, paired differences.
+
+    """
+
+    def __init__(self, faces, weights, dice_num = 1, names = None):
+        """
+        PURPOSE: Takes the shared faces and a matrix of weight vectors and builds the dice of every scenario.
+
+        INPUTS:
+            faces (np.ndarray): The faces of the dice, distinct values.
+            weights (array-like or pd.DataFrame): One row of weights (in the order of faces) per scenario, used for every
+            die, or a scenarios x dice x faces array for dice weighted differently. The index of a data frame names the
+            scenarios.
+            dice_num (int): The number of dice rolled together in every scenario. Defaults to 1.
+            names (iterable): The names of the scenarios. Defaults to None for the index of weights, or 0, 1, 2...
+
+        RAISES:
+            ValueError: If weights does not have one weight per face for every scenario (and die), or if the weights of a
+            die are negative or do not sum to a positive number.
+        """
+
+        if names is None and isinstance(weights, pd.DataFrame):
+            names = weights.index
+        weights = np.asarray(weights, dtype = float)
+        if weights.ndim == 2:
+            weights = np.broadcast_to(weights[:, None, :], (weights.shape[0], dice_num, weights.shape[1]))
+        if weights.ndim != 3 or weights.shape[1:] != (dice_num, len(faces)):
+            raise ValueError("Weights should have one weight per face for every scenario (and every die).")
+
+        self.faces = np.asarray(faces)
+        self.weights = weights
+        self.names = pd.Index(range(len(weights)) if names is None else list(names), name = 'scenario')
+        if len(self.names) != len(weights):
+            raise ValueError("There should be one name per scenario.")
+
+        self.games = []
+        for scenario in weights:
+            dice = []
+            for die_weights in scenario:
+                die = Dice(self.faces)
+                die.set_weights(die_weights)
+                die._probabilities()                        #checks the weights now rather than in the middle of the sweep
+                dice.append(die)
+            self.games.append(Game(dice))
+
+        # Values tracked per roll: the jackpot indicator, the number of dice showing each face, and the total of a
+        # roll when the faces are numbers. Sums are kept as floats, which are exact for integer values below 2**53.
+        self._numeric = np.issubdtype(self.games[0]._faces.dtype, np.number)
+
+
+    def _empty_totals(self):
+        """
+        PURPOSE: Returns zeroed running sums for every scenario.
+
+        OUTPUTS:
+            dict: 'sums' and 'squares' of the per-roll values, and 'difference_sums' and 'difference_squares' of their
+            differences from the baseline, each a scenarios x values array; and 'rolls'.
+        """
+
+        shape = (len(self.games), len(self.faces) + 1 + self._numeric)
+        totals = {name: np.zeros(shape)
+                  for name in ('sums', 'squares', 'difference_sums', 'difference_squares')}
+        totals['rolls'] = 0
+        return totals
+
+
+    def _roll_values(self, game, uniforms):
+        """
+        PURPOSE: Rolls a scenario from given uniform numbers and computes the per-roll values of its statistics, without
+        a dense rolls x faces array: the number of dice showing each face is kept sparse, as for Analyzer.face_count.
+
+        INPUTS:
+            game (Game): The game of the scenario.
+            uniforms (np.ndarray): A rolls x dice array of uniform numbers shared by all scenarios.
+
+        OUTPUTS:
+            dict: 'jackpot' (the jackpot indicator of every roll); 'keys', 'faces' and 'counts' (the sparse count of dice
+            per face of every roll, keys being roll * faces + face); 'face_sums' and 'face_squares' (the sums over rolls
+            of the counts and of their squares, per face) and, for numeric faces, 'total' (the total of every roll).
+        """
+
+        codes = np.empty(uniforms.shape, dtype = game._code_dtype)
+        for die, columns in game._weight_groups():
+            codes[:, columns] = game._face_codes[die._indices_from_uniforms(uniforms[:, columns], method = 'cdf')]
+
+        face_num = len(game._faces)
+        rolls, faces, counts = _roll_face_counts(codes, face_num)
+        counts = counts.astype(float)
+        values = {'jackpot': _jackpot_mask(codes).astype(float), 'keys': rolls.astype(np.int64) * face_num + faces,
+                  'faces': faces, 'counts': counts,
+                  'face_sums': np.bincount(codes.ravel(), minlength = face_num),
+                  'face_squares': np.bincount(faces, weights = counts**2, minlength = face_num)}
+        if self._numeric:
+            values['total'] = game._faces[codes].sum(axis = 1, dtype = float)
+        return values
+
+
+    def _add_block(self, totals, size, rng, baseline):
+        """
+        PURPOSE: Rolls one block for every scenario from the same uniform numbers and adds it to the running sums.
+
+        Memory grows with the rolls and dice of the block, not with the number of faces: face sums come from a bincount
+        of the codes and sums of squared face counts from the sparse counts.
+
+        INPUTS:
+            totals (dict): The running sums, see _empty_totals.
+            size (int): The number of rolls of the block.
+            rng (np.random.Generator): The generator of the block.
+            baseline (int): The position of the baseline scenario, or None.
+        """
+
+        uniforms = rng.random((size, self.weights.shape[1]))
+        face_num = len(self.faces)
+        reference = self._roll_values(self.games[baseline], uniforms) if baseline is not None else None
+
+        for i, game in enumerate(self.games):
+            values = reference if i == baseline else self._roll_values(game, uniforms)
+            sums, squares = totals['sums'][i], totals['squares'][i]
+
+            # Columns: jackpot indicator, count of dice per face (in face code order) and, for numeric faces, the total
+            sums[0] += values['jackpot'].sum()
+            squares[0] += values['jackpot'].sum()                     #an indicator is its own square
+            sums[1:face_num + 1] += values['face_sums']
+            squares[1:face_num + 1] += values['face_squares']
+            if self._numeric:
+                sums[-1] += values['total'].sum()
+                squares[-1] += values['total'] @ values['total']
+
+            if reference is not None:
+                difference_sums, difference_squares = totals['difference_sums'][i], totals['difference_squares'][i]
+                jackpot = values['jackpot'] - reference['jackpot']
+                difference_sums[0] += jackpot.sum()
+                difference_squares[0] += jackpot @ jackpot
+
+                # (a - b)**2 = a**2 + b**2 - 2ab, where ab is only nonzero for (roll, face) pairs seen in both scenarios
+                theirs = np.minimum(np.searchsorted(reference['keys'], values['keys']), len(reference['keys']) - 1)
+                mine = reference['keys'][theirs] == values['keys']          #keys are sorted, so a search finds the pairs
+                cross = np.bincount(values['faces'][mine], weights = values['counts'][mine] * reference['counts'][theirs[mine]],
+                                    minlength = face_num)
+                difference_sums[1:face_num + 1] += values['face_sums'] - reference['face_sums']
+                difference_squares[1:face_num + 1] += values['face_squares'] + reference['face_squares'] - 2 * cross
+                if self._numeric:
+                    total = values['total'] - reference['total']
+                    difference_sums[-1] += total.sum()
+                    difference_squares[-1] += total @ total
+        totals['rolls'] += size
+
+
+    def run(self, rolls, rng = None, workers = 1, baseline = None, confidence = 0.95):
+        """
+        PURPOSE: Plays every scenario for the same rolls, drawn from one set of uniform random numbers, and summarizes them.
+
+        Rolls are drawn in seeded blocks like Game.play, so for a given seed the table is the same whatever the number
+        of workers. Each die of a roll gets one uniform number, which every scenario maps through its inverse cumulative
+        distribution.
+
+        INPUTS:
+            rolls (int): The number of rolls per scenario.
+            rng (None, int, np.random.SeedSequence or np.random.Generator): A seed to draw the rolls from. Defaults to None.
+            workers (None or int): The number of processes to sample with, or None for one per CPU. Defaults to 1.
+            baseline (object): The name of a scenario to compare every scenario to. Defaults to None.
+            confidence (float): The confidence level of the intervals. Defaults to 0.95.
+
+        OUTPUTS:
+            pd.DataFrame: A tidy data frame with one row per scenario and statistic: 'scenario', 'statistic' ('jackpot'
+            for the jackpot rate, 'face' for the share of dice showing a face, 'total' for the mean total of a roll of
+            numeric faces), 'face', 'estimate' and 'half_width'. With a baseline, 'difference' and 'difference_half_width'
+            give the paired difference from the baseline scenario.
+
+        RAISES:
+            KeyError: If baseline is not the name of a scenario.
+        """
+
+        position = self.names.get_loc(baseline) if baseline is not None else None
+        root = _as_seed_sequence(rng)
+        blocks = [(size, _block_seed(root, block)) for block, (start, size) in enumerate(_block_sizes(rolls))]
+
+        workers = min(_worker_count(workers), max(len(blocks), 1))
+        if workers == 1:
+            totals = _sweep_blocks((self, blocks, position))
+        else:
+            # Deal contiguous runs of blocks to the workers and add up their sums
+            runs = np.array_split(np.arange(len(blocks)), min(4 * workers, len(blocks)))
+            tasks = [(self, [blocks[i] for i in run], position) for run in runs if len(run)]
+            totals = self._empty_totals()
+            with ProcessPoolExecutor(workers) as pool:
+                for partial in pool.map(_sweep_blocks, tasks):
+                    for name in totals:
+                        totals[name] += partial[name]
+
+        return self._table(totals, baseline is not None, confidence)
+
+
+    def _table(self, totals, paired, confidence):
+        """
+        PURPOSE: Turns the running sums into the tidy table of statistics returned by run.
+
+        INPUTS:
+            totals (dict): The running sums, see _empty_totals.
+            paired (bool): Whether differences from a baseline were tracked.
+            confidence (float): The confidence level of the intervals.
+
+        OUTPUTS:
+            pd.DataFrame: The tidy table.
+        """
+
+        rolls = totals['rolls']
+        faces = self.games[0]._faces
+        statistics = ['jackpot'] + ['face'] * len(faces) + ['total'] * self._numeric
+        labels = np.full(len(statistics), None, dtype = object)          #an object array keeps integer faces as integers
+        labels[1:1 + len(faces)] = faces
+
+        #Faces are counted per roll, but reported as the share of the dice showing them
+        scale = np.ones(len(statistics))
+        scale[1:1 + len(faces)] = self.weights.shape[1]
+
+        def summarize(sums, squares):
+            mean = sums / max(rolls, 1)
+            variance = squares / max(rolls, 1) - mean**2
+            return (mean / scale).ravel(), (_interval_half_width(mean, variance, rolls, confidence) / scale).ravel()
+
+        table = pd.DataFrame({'scenario': np.repeat(self.names.to_numpy(), len(statistics)),
+                              'statistic': np.tile(statistics, len(self.games)),
+                              'face': np.tile(labels, len(self.games))})
+        table['estimate'], table['half_width'] = summarize(totals['sums'], totals['squares'])
+        if paired:
+            table['difference'], table['difference_half_width'] = summarize(totals['difference_sums'],
+                                                                            totals['difference_squares'])
+        return table
@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import numpy as np
+
+
+#Vocabularies loaded from files, keyed by the absolute path, modification time and size of the file
+_file_cache = {}
+
+
+class Vocabulary:
+    """
+    A class representing a set of valid words, such as the Scrabble word list, that rolled sequences of faces can be
+    checked against. The words are kept in a hashed index, so looking up a word costs the same whatever the size of the
+    vocabulary, and all the permutations counted by an Analyzer can be matched in one bulk join.
+
+    ATTRIBUTES:
+        words (pd.Index): The distinct words of the vocabulary, backed by a hash table.
+
+    METHODS:
+        __init__ (self, words): Initializes the vocabulary with an iterable of words.
+
+        from_file (path): Class method that loads a vocabulary with one word per line, once per file.
+
+        match (self, counts): Joins the counts of an Analyzer.permutation_count data frame against the vocabulary and
+        returns the words found, with their frequencies.
+
+    """
+
+    def __init__(self, words):
+        """
+        PURPOSE: Takes an iterable of words and builds the hashed index of the vocabulary.
+
+        INPUTS:
+            words (iterable): The words of the vocabulary, as strings.
+        """
+
+        self.words = pd.Index(pd.unique(np.asarray(list(words), dtype = str)), name = 'word')
+
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        PURPOSE: Loads a vocabulary from a text file with whitespace-separated words, such as scrabble_words.txt. Each file is
+        read once; later calls return the cached vocabulary until the file changes on disk.
+
+        INPUTS:
+            path (str or os.PathLike): The word list file.
+
+        OUTPUTS:
+            Vocabulary: The vocabulary of the file.
+        """
+
+        path = os.path.abspath(path)
+        status = os.stat(path)
+        key = (path, status.st_mtime_ns, status.st_size)
+
+        if key not in _file_cache:
+            with open(path, 'r') as infile:
+                _file_cache[key] = cls(infile.read().split())
+        return _file_cache[key]
+
+
+    def __contains__(self, word):
+        return word in self.words
+
+
+    def __len__(self):
+        return len(self.words)
+
+
+    def match(self, counts):
+        """
+        PURPOSE: Finds which of the counted sequences of faces are words of the vocabulary. The faces of every counted roll
+        are joined into a string in one vectorized pass, and all the strings are looked up in the hashed index at once.
+
+        INPUTS:
+            counts (pd.DataFrame): A data frame with a 'Count' column, indexed by the face of each die, as returned by
+            Analyzer.permutation_count (or StreamAnalyzer.permutation_count).
+
+        OUTPUTS:
+            pd.DataFrame: The words found, indexed by word, with how many times each one was rolled in a 'Count' column.
+        """
+
+        # Faces of each die by position (level names are die numbers, so they cannot be used to select levels)
+        index = counts.index
+        if isinstance(index, pd.MultiIndex):
+            levels = [index.levels[i].to_numpy().astype(str)[index.codes[i]] for i in range(index.nlevels)]
+        else:
+            levels = [index.to_numpy().astype(str)]
+
+        # Join the faces of every roll into one string
+        candidates = levels[0]
+        for level in levels[1:]:
+            candidates = np.char.add(candidates, level)
+
+        found = self.words.get_indexer(candidates) >= 0
+        words = pd.DataFrame({'word': candidates[found], 'Count': counts['Count'].to_numpy()[found]})
+
+        #Different rolls can spell the same word when faces have several letters
+        return words.groupby('word', sort = False).sum()